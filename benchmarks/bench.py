@@ -0,0 +1,293 @@
+"""Latency of odev commands in a synthetic environment.
+
+Nothing real is touched: HOME is a temporary directory holding a fake
+~/.odev, git worktrees, a filestore and stubs of odoo-bin, psql, createdb,
+dropdb and pg_restore that keep the databases in a text file.
+
+    $ python benchmarks/bench.py                  # compare to the baseline
+    $ python benchmarks/bench.py --save-baseline  # after a known-good run
+
+benchmarks/baseline.json was measured on the tree before the performance
+work, checked out with `git worktree add /tmp/odev-base <commit>` and run
+with `--source /tmp/odev-base --save-baseline`.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import getpass
+import hashlib
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+import click
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+NAME = "master-bench"
+# a change is only reported past this relative difference
+THRESHOLD = 0.10
+
+DBS_STUB = """#!/bin/sh
+# the databases are the lines of $ODEV_BENCH/dbs
+dbs="$ODEV_BENCH/dbs"
+for arg; do name=$arg; done
+exec 9>"$dbs.lock"
+flock 9
+"""
+
+STUBS = {
+    "createdb": DBS_STUB + 'echo "$name" >> "$dbs"\n',
+    "dropdb": DBS_STUB
+    + 'grep -qx "$name" "$dbs" || exit 1\n'
+    + 'grep -vx "$name" "$dbs" > "$dbs.new"; mv "$dbs.new" "$dbs"\n',
+    "psql": DBS_STUB
+    + """sql=$name
+case "$sql" in
+  *"SELECT 1 FROM pg_database"*)
+    db=$(echo "$sql" | sed "s/.*datname = '\\([^']*\\)'.*/\\1/")
+    grep -qx "$db" "$dbs" && echo 1;;
+  *"SELECT oid"*)
+    db=$(echo "$sql" | sed "s/.*datname = '\\([^']*\\)'.*/\\1/")
+    grep -nx "$db" "$dbs" | cut -d: -f1;;
+  *"pg_database_size"*) awk '{print $1 "\\t" 1000000}' "$dbs";;
+  *"SELECT datname"*) cat "$dbs";;
+esac
+exit 0
+""",
+    "pg_restore": "#!/bin/sh\ncat > /dev/null\n",
+}
+
+ODOO_BIN = "import sys\nprint('odoo-bin', ' '.join(sys.argv[1:]))\n"
+
+
+class Env:
+    """The synthetic environment of one benchmark session."""
+
+    def __init__(
+        self, directory, envs, filestore_files, filestore_file_size, source=ROOT
+    ):
+        self.home = Path(directory)
+        self.bin = self.home / "bin"
+        self.worktrees = self.home / "worktrees"
+        self.filestore = self.home / "filestore"
+        self.dbs = self.home / "dbs"
+        self.names = [f"{NAME}-{index}" for index in range(envs)]
+        self.filestore_files = filestore_files
+        self.filestore_file_size = filestore_file_size
+        self.environ = dict(
+            os.environ,
+            HOME=str(self.home),
+            PATH=f"{self.bin}{os.pathsep}{os.environ['PATH']}",
+            PYTHONPATH=str(source),
+            ODEV_BENCH=str(self.home),
+            # odev passes it to createdb -O
+            USER=getpass.getuser(),
+            # never reach a real server, even with psycopg2 installed
+            PGHOST=str(self.home / "no-server"),
+        )
+
+    def build(self):
+        self.bin.mkdir()
+        for program, script in STUBS.items():
+            path = self.bin / program
+            path.write_text(script)
+            path.chmod(0o755)
+
+        (self.home / ".odev").write_text(
+            "[DEFAULT]\n"
+            f"src = {self.home / 'src'}\n"
+            "custom-addons =\n"
+            f"worktrees = {self.worktrees}\n"
+            f"workspaces = {self.home / 'workspaces'}\n"
+            f"filestore = {self.filestore}\n"
+            "port = 8070\n"
+            "pool-size = 0\n"
+            f"python = {sys.executable}\n"
+        )
+        (self.home / ".odev.json").write_text(
+            json.dumps({"all": [NAME, *self.names], "current": NAME})
+        )
+
+        odoo = self.worktrees / "master" / "odoo"
+        for addons_dir, module in [("odoo/addons", "base"), ("addons", "web")]:
+            (odoo / addons_dir / module).mkdir(parents=True)
+            (odoo / addons_dir / module / "__manifest__.py").write_text("{}")
+        (odoo / "odoo-bin").write_text(ODOO_BIN)
+        repos = [
+            odoo,
+            self.worktrees / "master" / "enterprise",
+            self.home / "src" / "upgrade",
+        ]
+        for repo in repos:
+            git_repo(repo, [NAME, *self.names])
+
+        self.dbs.write_text(f"{NAME}-basedb\n")
+        random.seed(0)
+        basedb = self.filestore / f"{NAME}-basedb"
+        for _ in range(self.filestore_files):
+            data = random.randbytes(self.filestore_file_size)
+            sha = hashlib.sha1(data).hexdigest()
+            (basedb / sha[:2]).mkdir(parents=True, exist_ok=True)
+            (basedb / sha[:2] / sha).write_bytes(data)
+
+    def odev(self, *args):
+        start = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, "-m", "odev", *args],
+            env=self.environ,
+            cwd=self.home,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        elapsed = time.perf_counter() - start
+        if process.returncode:
+            raise click.ClickException(
+                f"odev {' '.join(args)} failed:\n{process.stderr.decode()}"
+            )
+        return elapsed
+
+    def add_dbs(self, count):
+        names = [f"{NAME}-drop-{index}" for index in range(count)]
+        with open(self.dbs, "a") as file:
+            file.write("".join(f"{name}\n" for name in names))
+        for name in names:
+            (self.filestore / name / "ab").mkdir(parents=True)
+            (self.filestore / name / "ab" / "blob").write_bytes(b"x" * 4096)
+
+    def wait_for_reaper(self, timeout=30):
+        trash = self.filestore / ".trash"
+        deadline = time.time() + timeout
+        while trash.is_dir() and any(trash.iterdir()) and time.time() < deadline:
+            time.sleep(0.05)
+
+
+def git_repo(path, branches):
+    path.mkdir(parents=True, exist_ok=True)
+
+    def git(*args, **kwargs):
+        subprocess.run(["git", *args], cwd=path, check=True, **kwargs)
+
+    git("init", "-q", "-b", "master")
+    (path / ".keep").write_text("")
+    git("add", ".keep")
+    git("-c", "user.name=bench", "-c", "user.email=b@localhost", "commit", "-qm", ".")
+    refs = "".join(f"create refs/heads/{branch} HEAD\n" for branch in branches)
+    git("update-ref", "--stdin", input=refs.encode())
+
+
+def benchmarks(env, drop_dbs):
+    """Name and function of each benchmark, the function returns seconds."""
+
+    def drop_all():
+        env.add_dbs(drop_dbs)
+        elapsed = env.odev("drop", f"{NAME}-drop", "--all")
+        env.wait_for_reaper()
+        if f"{NAME}-drop-" in env.dbs.read_text():
+            raise click.ClickException("odev drop --all left databases behind")
+        return elapsed
+
+    def start_fresh():
+        elapsed = env.odev("start", NAME, "--fresh")
+        copied = sum(len(files) for _, _, files in os.walk(env.filestore / NAME))
+        if copied != env.filestore_files:
+            raise click.ClickException(f"odev start --fresh copied {copied} files")
+        return elapsed
+
+    return [
+        ("cold start (--help)", lambda: env.odev("--help")),
+        ("current", lambda: env.odev("current")),
+        (f"list ({len(env.names)} envs)", lambda: env.odev("list")),
+        (
+            f"select ({len(env.names)} envs)",
+            lambda: env.odev("select", "-s", env.names[-1]),
+        ),
+        (
+            f"start --fresh ({env.filestore_files} files)",
+            start_fresh,
+        ),
+        (f"drop --all ({drop_dbs} dbs)", drop_all),
+    ]
+
+
+def compare(results, baseline):
+    click.echo(f"\n{'benchmark':<36}{'median':>10}{'min':>10}{'baseline':>10}")
+    for name, times in results.items():
+        median = statistics.median(times)
+        line = f"{name:<36}{median * 1000:>8.1f}ms{min(times) * 1000:>8.1f}ms"
+        if name in baseline:
+            reference = baseline[name]
+            delta = (median - reference) / reference
+            line += f"{reference * 1000:>8.1f}ms  {delta:+.0%}"
+            if delta > THRESHOLD:
+                line += " slower"
+            elif delta < -THRESHOLD:
+                line += " faster"
+        click.echo(line)
+
+
+@click.command()
+@click.option("-n", "--repeat", default=5, help="Runs of each benchmark.")
+@click.option("--envs", default=300, help="Dev envs known to odev.")
+@click.option("--filestore-files", default=2000)
+@click.option("--filestore-file-size", default=16 * 1024)
+@click.option("--drop-dbs", default=100, help="Databases dropped by drop --all.")
+@click.option("-k", "--only", help="Only run the benchmarks containing this.")
+@click.option("--baseline", type=click.Path(), default=str(BASELINE))
+@click.option("--save-baseline", is_flag=True, default=False)
+@click.option(
+    "--source",
+    type=click.Path(exists=True, file_okay=False),
+    default=str(ROOT),
+    help="odev tree to benchmark, e.g. a worktree of an older commit.",
+)
+def main(
+    repeat,
+    envs,
+    filestore_files,
+    filestore_file_size,
+    drop_dbs,
+    only,
+    baseline,
+    save_baseline,
+    source,
+):
+    directory = tempfile.mkdtemp(prefix="odev-bench-")
+    try:
+        env = Env(directory, envs, filestore_files, filestore_file_size, source)
+        click.echo(f"building the environment in {directory}")
+        env.build()
+
+        results = {}
+        for name, function in benchmarks(env, drop_dbs):
+            if only and only not in name:
+                continue
+            # the first run warms up the page cache and the .pyc files
+            try:
+                function()
+            except click.ClickException as error:
+                # e.g. an option the benchmarked tree doesn't have yet
+                click.echo(f"{name}: skipped, {error.message.splitlines()[0]}")
+                continue
+            results[name] = [function() for _ in range(repeat)]
+            click.echo(f"{name}: {statistics.median(results[name]) * 1000:.1f}ms")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    baseline = Path(baseline)
+    reference = json.loads(baseline.read_text()) if baseline.exists() else {}
+    compare(results, reference)
+    if save_baseline:
+        reference.update(
+            {name: statistics.median(times) for name, times in results.items()}
+        )
+        baseline.write_text(json.dumps(reference, indent=4) + "\n")
+        click.echo(f"\nbaseline saved in {baseline}")
+
+
+if __name__ == "__main__":
+    main()
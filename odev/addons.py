@@ -0,0 +1,301 @@
+import os
+import ast
+import json
+import shutil
+import hashlib
+import subprocess
+from pathlib import Path
+
+MANIFEST = "__manifest__.py"
+# server wide modules, loaded whatever the database
+SERVER_WIDE = ["base", "web"]
+MAX_FARMS = 20
+
+
+def find_modules(addons_dirs):
+    """Map the name of every module found in `addons_dirs` to its directory.
+
+    The first addons directory wins, like in odoo's addons path.
+    """
+    modules = {}
+    for addons_dir in addons_dirs:
+        try:
+            entries = os.scandir(addons_dir)
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.name in modules or not entry.is_dir():
+                    continue
+                if os.path.isfile(os.path.join(entry.path, MANIFEST)):
+                    modules[entry.name] = Path(entry.path)
+    return modules
+
+
+def read_manifest(module_dir):
+    with open(Path(module_dir) / MANIFEST) as file:
+        return ast.literal_eval(file.read())
+
+
+def closure(modules, names):
+    """`names` and all their (indirect) dependencies known in `modules`."""
+    result = set()
+    todo = [name for name in names if name in modules]
+    while todo:
+        name = todo.pop()
+        if name in result:
+            continue
+        result.add(name)
+        depends = read_manifest(modules[name]).get("depends", [])
+        todo.extend(depend for depend in depends if depend in modules)
+    return result
+
+
+def index(addons_dirs, index_file):
+    """Name, path, depends and auto_install of every module of `addons_dirs`.
+
+    The index is kept in `index_file` and a manifest is only parsed again
+    when its mtime changed.
+    """
+    try:
+        with open(index_file) as file:
+            cached = json.load(file)
+    except (FileNotFoundError, ValueError):
+        cached = {}
+
+    result = {}
+    for name, path in find_modules(addons_dirs).items():
+        mtime = os.stat(path / MANIFEST).st_mtime
+        entry = cached.get(name)
+        if not entry or entry["path"] != str(path) or entry["mtime"] != mtime:
+            try:
+                entry = index_entry(read_manifest(path), str(path))
+            except (SyntaxError, ValueError):
+                continue
+            entry["mtime"] = mtime
+        result[name] = entry
+
+    if result != cached:
+        index_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = index_file.with_name(f".{index_file.name}.{os.getpid()}")
+        with open(temp_file, "w") as file:
+            json.dump(result, file)
+        os.replace(temp_file, index_file)
+    return result
+
+
+def index_entry(manifest, path):
+    depends = manifest.get("depends", [])
+    auto_install = manifest.get("auto_install", False)
+    if auto_install is True:
+        auto_install = depends
+    return {
+        "path": path,
+        "depends": depends,
+        # modules whose installation triggers this one
+        "auto_install": auto_install
+        if auto_install is not False and manifest.get("installable", True)
+        else None,
+    }
+
+
+def index_at(repo, rev, addons_dirs):
+    """Like `index`, from the manifests committed at `rev` in `repo`.
+
+    `addons_dirs`, and the paths in the result, are relative to the root of
+    the repo ("" for the root itself). Nothing needs to be checked out: the
+    manifests are read from the object store in a single `git cat-file`.
+    """
+    paths = {}
+    for addons_dir in addons_dirs:
+        pathspec = f"{addons_dir}/" if addons_dir else "."
+        _, tree = git(["ls-tree", "--name-only", rev, "--", pathspec], repo)
+        for path in tree.splitlines():
+            paths.setdefault(os.path.basename(path), path)
+
+    requests = "".join(f"{rev}:{path}/{MANIFEST}\n" for path in paths.values())
+    process = subprocess.run(
+        ["git", "cat-file", "--batch"],
+        cwd=repo,
+        input=requests.encode(),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    output = process.stdout
+    result = {}
+    position = 0
+    for name, path in paths.items():
+        end = output.index(b"\n", position)
+        header = output[position:end].split()
+        position = end + 1
+        if header[-1] == b"missing":
+            continue
+        size = int(header[2])
+        content = output[position : position + size]
+        position += size + 1
+        try:
+            manifest = ast.literal_eval(content.decode("utf-8"))
+        except (SyntaxError, ValueError, UnicodeDecodeError):
+            continue
+        result[name] = index_entry(manifest, path)
+    return result
+
+
+def required(index, names):
+    """`names`, their dependencies and the auto_install modules they bring in."""
+    result = set()
+    todo = [name for name in [*SERVER_WIDE, *names] if name in index]
+    while todo:
+        while todo:
+            name = todo.pop()
+            if name in result:
+                continue
+            result.add(name)
+            todo.extend(depend for depend in index[name]["depends"] if depend in index)
+        todo = [
+            name
+            for name, entry in index.items()
+            if name not in result
+            and entry["auto_install"] is not None
+            and set(entry["auto_install"]) <= result
+        ]
+    return result
+
+
+def dependents(index, names, among):
+    """`names` and the modules of `among` depending, even indirectly, on them."""
+    result = set(names)
+    todo = [name for name in among if name in index and name not in result]
+    while True:
+        found = [name for name in todo if set(index[name]["depends"]) & result]
+        if not found:
+            return result
+        result.update(found)
+        todo = [name for name in todo if name not in result]
+
+
+def farm(index, names, farms_dir):
+    """Directory of symlinks to the modules `names`, usable as addons path.
+
+    A farm is named after the paths it links to, so it is reused as long as
+    the index resolves `names` to the same directories.
+    """
+    paths = sorted(f"{name}:{index[name]['path']}" for name in names)
+    key = hashlib.sha1("\n".join(paths).encode()).hexdigest()[:12]
+    farm_dir = farms_dir / key
+    if farm_dir.exists():
+        os.utime(farm_dir)
+        return farm_dir
+
+    temp_dir = farms_dir / f".{key}.{os.getpid()}"
+    temp_dir.mkdir(parents=True)
+    for name in names:
+        os.symlink(index[name]["path"], temp_dir / name)
+    try:
+        os.rename(temp_dir, farm_dir)
+    except OSError:
+        # built concurrently by another odev
+        shutil.rmtree(temp_dir)
+
+    # least recently used first, as reusing a farm touches it
+    farms = sorted(
+        (path for path in farms_dir.iterdir() if path.is_dir() and path.name[0] != "."),
+        key=lambda path: path.stat().st_mtime,
+    )
+    in_use = farms_in_use()
+    for path in farms[:-MAX_FARMS]:
+        if path != farm_dir and str(path) not in in_use:
+            shutil.rmtree(path, ignore_errors=True)
+    return farm_dir
+
+
+def farms_in_use():
+    """Directories in the addons path of the running odoo-bin processes."""
+    from . import procs
+
+    paths = set()
+    for pid in procs.odoo_bin_proc_ids():
+        cmdline = procs.read_cmdline(pid)
+        for i, arg in enumerate(cmdline):
+            if arg == "--addons-path" and i + 1 < len(cmdline):
+                arg = f"--addons-path={cmdline[i + 1]}"
+            if arg.startswith("--addons-path="):
+                paths.update(arg.split("=", 1)[1].split(","))
+    return paths
+
+
+def git(args, cwd):
+    process = subprocess.run(
+        ["git", *args], cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    return process.returncode == 0, process.stdout.decode("utf-8", "replace")
+
+
+def content_hash(path):
+    digest = hashlib.sha1()
+    for root, dirs, filenames in os.walk(path):
+        dirs.sort()
+        for filename in sorted(filenames):
+            filepath = os.path.join(root, filename)
+            digest.update(os.path.relpath(filepath, path).encode())
+            with open(filepath, "rb") as file:
+                digest.update(hashlib.sha1(file.read()).digest())
+    return digest.hexdigest()
+
+
+def fingerprints(addons_dirs, names=None):
+    """Fingerprint of each module of `addons_dirs` (or only of `names`).
+
+    In a git checkout it is the tree hash of the module at HEAD, combined with
+    the content of its modified and untracked files. Outside git, it is a
+    hash of the whole module content.
+    """
+    result = {}
+    for addons_dir in addons_dirs:
+        modules = find_modules([addons_dir])
+        if names is not None:
+            modules = {
+                name: path
+                for name, path in modules.items()
+                if name in names and name not in result
+            }
+        if not modules:
+            continue
+
+        is_git, toplevel = git(["rev-parse", "--show-toplevel"], addons_dir)
+        if not is_git:
+            for name, path in modules.items():
+                result.setdefault(name, content_hash(path))
+            continue
+
+        toplevel = Path(toplevel.strip())
+        _, tree = git(["ls-tree", "HEAD", "--", "./"], addons_dir)
+        trees = {}
+        for line in tree.splitlines():
+            info, path = line.split("\t", 1)
+            trees[os.path.basename(path)] = info.split()[2]
+
+        _, status = git(
+            ["status", "--porcelain", "-z", "--untracked-files=all", "--", "./"],
+            addons_dir,
+        )
+        dirty = {}
+        entries = iter(status.split("\0"))
+        for entry in entries:
+            if len(entry) < 4:
+                continue
+            if entry[0] in "RC":
+                # renames and copies are followed by their original path
+                next(entries, None)
+            path = toplevel / entry[3:]
+            relative = os.path.relpath(path, addons_dir)
+            dirty.setdefault(relative.split(os.sep)[0], []).append(path)
+
+        for name in modules:
+            digest = hashlib.sha1(trees.get(name, "").encode())
+            for path in sorted(dirty.get(name, [])):
+                digest.update(str(path).encode())
+                if path.is_file():
+                    digest.update(hashlib.sha1(path.read_bytes()).digest())
+            result.setdefault(name, digest.hexdigest())
+    return result
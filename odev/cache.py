@@ -0,0 +1,115 @@
+import os
+import time
+import hashlib
+
+import click
+
+from . import db
+from . import addons
+from . import persist
+from .addons import git
+from .filestore import human_size
+from .utils import run
+
+
+def get_commit(repo_dir):
+    """HEAD of `repo_dir`, False if it isn't a clean git checkout."""
+    is_git, commit = git(["rev-parse", "HEAD"], repo_dir)
+    if not is_git:
+        return False
+    _, status = git(["status", "--porcelain", "--untracked-files=no"], repo_dir)
+    return False if status.strip() else commit.strip()
+
+
+def get_key(obj, name, modules, no_demo):
+    """Key of the basedb built by `odev basedb` for the current state of `name`.
+
+    Returns False when a worktree has uncommitted changes, as the result of
+    the build then doesn't only depend on the commits. The custom addons,
+    which needn't be a git checkout, are part of the key through the
+    fingerprints of their modules.
+    """
+    resolved = obj.resolve(name)
+    odoo_commit = get_commit(os.path.dirname(resolved["odoo_bin"]))
+    enterprise_commit = get_commit(resolved["enterprise"])
+    if not odoo_commit or (
+        os.path.isdir(resolved["enterprise"]) and not enterprise_commit
+    ):
+        return False
+    modules = sorted(module for module in (modules or "").split(",") if module)
+    raw = f"{odoo_commit}:{enterprise_commit}:{','.join(modules)}:{bool(no_demo)}"
+    if obj.custom_addons_dir:
+        fingerprints = addons.fingerprints([str(obj.custom_addons_dir)])
+        raw += ":" + ",".join(f"{m}={fp}" for m, fp in sorted(fingerprints.items()))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def get_entries():
+    return persist.get("basedb_cache") or dict()
+
+
+def cache_dbname(key):
+    return f"odev-cache-{key[:12]}"
+
+
+def lookup(key):
+    entry = get_entries().get(key)
+    if not entry or not db.admin().exists(entry["db"]):
+        return False
+    with persist.transaction():
+        # another odev may have evicted it meanwhile
+        entries = get_entries()
+        if key not in entries:
+            return False
+        entries[key]["last_used"] = time.time()
+        persist.save("basedb_cache", entries)
+    return entry["db"]
+
+
+def store(obj, key, dbname, description):
+    """Keep a copy of the freshly built `dbname` as the cache entry of `key`."""
+    cache_db = cache_dbname(key)
+    obj.dropdb(cache_db)
+    if not obj.copydb(dbname, cache_db):
+        return False
+    obj.clone_filestore(dbname, cache_db)
+    size = db.admin().sizes([cache_db]).get(cache_db, 0)
+    size += du(obj.filestore / cache_db)
+    with persist.transaction():
+        entries = get_entries()
+        entries[key] = {
+            "db": cache_db,
+            "size": size,
+            "last_used": time.time(),
+            "description": description,
+        }
+        persist.save("basedb_cache", entries)
+    evict(obj)
+    return cache_db
+
+
+def evict(obj):
+    """Drop the least recently used entries until the cache fits its budget."""
+    budget = obj.basedb_cache_size
+    with persist.transaction():
+        entries = get_entries()
+        by_last_use = sorted(entries.items(), key=lambda item: item[1]["last_used"])
+        total = sum(entry["size"] for entry in entries.values())
+        evicted = []
+        while by_last_use and total > budget:
+            key, entry = by_last_use.pop(0)
+            total -= entry["size"]
+            evicted.append(entries.pop(key))
+        persist.save("basedb_cache", entries)
+    for entry in evicted:
+        click.echo(f"evict {entry['description']} ({human_size(entry['size'])})")
+        obj.dropdb(entry["db"])
+        run(obj.drop_filestore(entry["db"]))
+
+
+def du(path):
+    total = 0
+    for root, _, filenames in os.walk(path):
+        for filename in filenames:
+            total += os.lstat(os.path.join(root, filename)).st_size
+    return total
@@ -1,15 +0,0 @@
-from .prepare import prepare
-from .basedb import basedb
-from .start import start
-from .test import test
-from .remove import remove
-from .drop import drop
-from .list_ import list_
-from .cd import cd
-from .import_ import import_
-from .listdb import listdb
-from .kill import kill
-from .select import select
-from .current import current
-from .code import code
-from .worktree import worktree
@@ -1,19 +1,54 @@
 import click
 
 from ..utils import run, identify_current
-from ..main import main
+from .. import cache
+from .. import pool
+from .. import updates
 
 
-@main.command("basedb")
+@click.command("basedb")
 @click.argument("name", required=False)
 @click.option("-a", "--alias")
 @click.option("-i", "--install-modules")
 @click.option("-l", "--list", default=False, is_flag=True)
 @click.option("-n", "--no-demo", default=False, is_flag=True)
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    default=False,
+    help="Rebuild even if an identical basedb is cached.",
+)
 @click.pass_obj
 @identify_current
-def basedb(obj, name, alias, install_modules, list, no_demo):
+def basedb(obj, name, alias, install_modules, list, no_demo, no_cache):
     dbname = f"{name}-{alias if alias else 'basedb'}"
-    run(obj.dropdb(dbname))
+    key = obj.basedb_cache_size and cache.get_key(obj, name, install_modules, no_demo)
+    cached = key and not no_cache and cache.lookup(key)
+
+    obj.dropdb(dbname)
     run(obj.drop_filestore(dbname))
-    run(obj.init_db(name, dbname, install_modules, no_demo), verbose=True)
+    if cached:
+        click.echo(f"{dbname} is cloned from {cached}.")
+        obj.copydb(cached, dbname)
+        obj.clone_filestore(cached, dbname)
+    else:
+        snapshot = updates.snapshot(obj, name, dbname, install_modules or "base")
+        with obj.open_log(dbname) as log:
+            success, _, _ = run(
+                obj.init_db(name, dbname, install_modules, no_demo),
+                verbose=True,
+                instance=dict(name=name, dbname=dbname),
+                log=log,
+                tail=True,
+            )
+        # a new database installs at least base
+        updates.record(snapshot, install_modules or "base")
+        if success and key:
+            description = f"{name}: {install_modules or 'base'}"
+            if no_demo:
+                description += " (no demo)"
+            cache.store(obj, key, dbname, description)
+
+    if obj.pool_size:
+        # slots cloned from the previous build are evicted by the refill
+        pool.fill_in_background(dbname)
@@ -2,10 +2,9 @@ import click
 import os
 
 from ..utils import identify_current, get_base_branch
-from ..main import main
 
 
-@main.command("cd")
+@click.command("cd")
 @click.argument("name", required=False)
 @click.pass_obj
 @identify_current
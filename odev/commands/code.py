@@ -1,10 +1,9 @@
 import click
 
-from ..main import main
 from ..utils import run, get_base_branch
 
 
-@main.command("code")
+@click.command("code")
 @click.pass_obj
 def code(obj):
     base_branch, _ = get_base_branch(obj.get_current())
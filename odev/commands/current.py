@@ -1,9 +1,7 @@
 import click
 
-from ..main import main
 
-
-@main.command("current")
+@click.command("current")
 @click.pass_obj
 def current(obj):
     click.echo(f"{obj.get_current()}")
@@ -1,18 +1,16 @@
 import click
 
-from ..utils import run, get_dbs, identify_current
-from ..main import main
+from ..utils import get_dbs, identify_current
 
 
-@main.command("drop")
+@click.command("drop")
 @click.argument("name", required=False)
 @click.option('-s', '--suffix')
 @click.option('-a', '--all', is_flag=True)
+@click.option("-j", "--jobs", default=4, help="Databases dropped concurrently.")
 @click.pass_obj
 @identify_current
-def drop(obj, name, suffix, all):
+def drop(obj, name, suffix, all, jobs):
     dbname = f"{name}{f'-{suffix}' if suffix else ''}"
     dbs = get_dbs(dbname) if all else [dbname]
-    for db in dbs:
-        run(obj.dropdb(db))
-        run(obj.drop_filestore(db))
+    obj.drop_dbs(dbs, jobs)
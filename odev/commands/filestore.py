@@ -0,0 +1,41 @@
+import click
+
+from ..utils import get_dbs
+from .. import filestore as filestore_
+
+
+@click.group("filestore")
+def filestore():
+    """Maintenance of the filestores."""
+
+
+@filestore.command("gc")
+@click.option("-n", "--dry-run", is_flag=True, default=False)
+@click.option("-j", "--jobs", type=int, help="Files hashed concurrently.")
+@click.pass_obj
+def gc(obj, dry_run, jobs):
+    """Share identical blobs between filestores, remove orphan filestores.
+
+    Identical blobs are replaced by hardlinks to a shared copy kept in
+    <filestore>/.store. Filestores whose database doesn't exist anymore are
+    moved to the trash and deleted in the background.
+    """
+    dbnames = set(get_dbs(None))
+    if not dbnames:
+        # an unreachable server would otherwise orphan every filestore
+        click.echo("No database found, is PostgreSQL running?", err=True)
+        exit(1)
+    stats = filestore_.gc(obj.filestore, dbnames, jobs, dry_run)
+    for orphan in stats.orphans:
+        click.echo(f"{'would remove' if dry_run else 'remove'} {orphan}")
+    click.echo(f"{'dry run: ' if dry_run else ''}{stats.summary()}")
+    if stats.orphans and not dry_run:
+        filestore_.reap_in_background(obj.filestore)
+
+
+@filestore.command("reap", hidden=True)
+@click.argument("root", required=False)
+@click.pass_obj
+def reap(obj, root):
+    """Delete the filestores moved to the trash by `odev drop`."""
+    filestore_.reap(root or obj.filestore)
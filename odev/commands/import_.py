@@ -1,31 +1,181 @@
 import os
+import shutil
+import getpass
 import tempfile
+import subprocess
+import zipfile as zipfile_
 from pathlib import Path
 
 import click
 
 from ..utils import run, identify_current
-from ..main import main
+from ..filestore import human_size
 
+CHUNK_SIZE = 1024 * 1024
+# first bytes of a pg_dump custom format archive
+PGDMP = b"PGDMP"
 
-@main.command("import")
+
+@click.command("import")
 @click.argument("name", required=False)
-@click.option("-z", "--zipfile", type=click.Path(exists=True))
+@click.option("-z", "--zipfile", type=click.Path(exists=True), required=True)
 @click.option("-s", "--suffix")
+@click.option("-j", "--jobs", default=os.cpu_count() or 1, help="pg_restore jobs.")
 @click.pass_obj
 @identify_current
-def import_(obj, name, zipfile, suffix):
+def import_(obj, name, zipfile, suffix, jobs):
+    """Import a database backup (zip with dump.sql or a pg_dump archive).
+
+    The filestore is extracted straight into place and dump.sql is streamed
+    into psql. Custom and directory format dumps are restored with
+    `pg_restore -j JOBS`.
+    """
     dbname = f"{name}{f'-{suffix}' if suffix else ''}"
 
-    with tempfile.TemporaryDirectory() as tempdir:
-        temppath = Path(tempdir)
-        run(["unzip", zipfile, "-d", tempdir])
-        dumpfile = temppath / "dump.sql"
-        filestore = temppath / "filestore"
-        if (obj.filestore / dbname).exists():
-            run(["rm", "-rf", str(obj.filestore / dbname)])
-        run(["cp", "-r", str(filestore), str(obj.filestore / dbname)])
-        run(["createdb", dbname])
-        run(["psql", "-U", os.getlogin(), "-d", dbname, "-f", str(dumpfile)])
+    if not zipfile_.is_zipfile(zipfile):
+        # a bare custom format dump, pg_restore can read it in place
+        obj.createdb(dbname)
+        return restore(dbname, zipfile, jobs)
+
+    with zipfile_.ZipFile(zipfile) as archive:
+        with tempfile.TemporaryDirectory() as tempdir:
+            # every member is checked before the database is created
+            filestore = filestore_members(archive, obj.filestore / dbname)
+            members = {info.filename: info for info in archive.infolist()}
+            sql = members.get("dump.sql")
+            dump = sql or extract_dump(archive, members, Path(tempdir))
+            if not dump:
+                click.echo(f"No dump found in {zipfile}.", err=True)
+                return 1
+            # the database first, or `filestore gc` could take its filestore
+            # for an orphan
+            obj.createdb(dbname)
+            extract_filestore(archive, obj.filestore / dbname, filestore)
+            if sql:
+                return stream_sql(archive, sql, dbname)
+            return restore(dbname, dump, jobs)
+
+
+def echo_progress(label, done, total):
+    percent = f" ({done * 100 // total}%)" if total else ""
+    click.echo(
+        f"\r{label}: {human_size(done)} / {human_size(total)}{percent}", nl=False
+    )
+
+
+def copy_member(archive, info, dst, label, done, total):
+    with archive.open(info) as rfile, open(dst, "wb") as wfile:
+        while True:
+            chunk = rfile.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            wfile.write(chunk)
+            done += len(chunk)
+            echo_progress(label, done, total)
+    return done
+
+
+def member_path(root, name):
+    """Where the archive member `name` goes under `root`, refusing members
+    that would land outside of it (`..`, absolute paths)."""
+    target = (root / name).resolve()
+    if not target.is_relative_to(root.resolve()):
+        raise click.ClickException(f"Refusing to extract {name} outside of {root}.")
+    return target
+
+
+def filestore_members(archive, dst):
+    """The filestore members of `archive` and where each goes under `dst`."""
+    members = [
+        info
+        for info in archive.infolist()
+        if info.filename.startswith("filestore/") and not info.is_dir()
+    ]
+    targets = [member_path(dst, info.filename[len("filestore/") :]) for info in members]
+    return list(zip(members, targets))
+
+
+def extract_filestore(archive, dst, members):
+    if dst.exists():
+        shutil.rmtree(dst)
+    total = sum(info.file_size for info, _ in members)
+    done = 0
+    for info, target in members:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        done = copy_member(archive, info, target, f"filestore {dst}", done, total)
+    click.echo(f"\nfilestore {dst} : {len(members)} files")
+
+
+def stream_sql(archive, info, dbname):
+    """Pipe the dump.sql member into psql without writing it to disk."""
+    command = ["psql", "-q", "-v", "ON_ERROR_STOP=1", "-U", getpass.getuser()]
+    command += ["-d", dbname]
+    click.echo(" ".join(command) + " < dump.sql")
+    process = subprocess.Popen(
+        command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL
+    )
+    done = 0
+    try:
+        with archive.open(info) as rfile:
+            while True:
+                chunk = rfile.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                process.stdin.write(chunk)
+                done += len(chunk)
+                echo_progress("dump.sql", done, info.file_size)
+    except BrokenPipeError:
+        pass
+    finally:
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            # psql stopped early, e.g. on an error with ON_ERROR_STOP
+            pass
+    process.wait()
+    click.echo(f"\n{' '.join(command)} : {process.returncode}")
+    if process.returncode:
+        raise click.ClickException(f"dump.sql could not be restored into {dbname}.")
+    return process.returncode
+
+
+def extract_dump(archive, members, tempdir):
+    """Extract a custom or directory format dump, which pg_restore -j can seek."""
+    for filename, info in members.items():
+        if filename.endswith("toc.dat"):
+            # directory format: toc.dat and the data files next to it
+            dump = filename[: -len("toc.dat")]
+            dump_members = [
+                info
+                for name, info in members.items()
+                if name.startswith(dump)
+                and not name.startswith("filestore/")
+                and not info.is_dir()
+            ]
+            break
+        if not info.is_dir() and not filename.startswith("filestore/"):
+            with archive.open(info) as rfile:
+                if rfile.read(len(PGDMP)) == PGDMP:
+                    dump, dump_members = filename, [info]
+                    break
+    else:
+        return False
+
+    targets = [member_path(tempdir, info.filename) for info in dump_members]
+    total = sum(info.file_size for info in dump_members)
+    done = 0
+    for info, target in zip(dump_members, targets):
+        target.parent.mkdir(parents=True, exist_ok=True)
+        done = copy_member(archive, info, target, "dump", done, total)
+    click.echo("")
+    return tempdir / dump
+
 
+def restore(dbname, dump, jobs):
+    success, _, _ = run(
+        ["pg_restore", "--no-owner", "-j", str(jobs), "-d", dbname, str(dump)],
+        verbose=True,
+    )
+    if not success:
+        raise click.ClickException(f"{dump} could not be restored into {dbname}.")
     return 0
@@ -1,14 +1,13 @@
-import subprocess
 import click
 
-from ..utils import run, odoo_bin_proc_ids, identify_current
-from ..main import main
+from ..utils import identify_current
+from ..procs import odoo_bin_proc_ids, terminate
 
 
-@main.command("kill")
+@click.command("kill")
 @click.argument("name", required=False)
+@click.option("-t", "--timeout", default=10, help="Seconds before SIGKILL.")
 @click.pass_obj
 @identify_current
-def kill(obj, name):
-    for proc_id in odoo_bin_proc_ids(name):
-        run(["sudo", "kill", "-9", proc_id])
+def kill(obj, name, timeout):
+    terminate(odoo_bin_proc_ids(name), timeout)
@@ -1,9 +1,7 @@
 import click
 
-from ..main import main
 
-
-@main.command("list")
+@click.command("list")
 @click.option("-s", "--search-string")
 @click.pass_obj
 def list_(obj, search_string):
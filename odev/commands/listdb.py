@@ -1,15 +1,21 @@
-import subprocess
 import click
 
-from ..utils import run, identify_current
-from ..main import main
+from ..utils import get_dbs, identify_current
+from ..filestore import human_size
+from .. import db
 
 
-@main.command("listdb")
+@click.command("listdb")
 @click.argument("name", required=False)
+@click.option("-s", "--sizes", is_flag=True, default=False)
 @click.pass_obj
 @identify_current
-def listdb(obj, name):
-    proc = subprocess.Popen(f"psql -l|awk '{{print $1}}'|grep -w {name}", shell=True)
-    proc.communicate()
-    return proc.returncode
+def listdb(obj, name, sizes):
+    dbs = get_dbs(name)
+    db_sizes = db.admin().sizes(dbs) if sizes else {}
+    for dbname in dbs:
+        if sizes:
+            click.echo(f"{dbname:<50}{human_size(db_sizes.get(dbname, 0)):>12}")
+        else:
+            click.echo(dbname)
+    return 0 if dbs else 1
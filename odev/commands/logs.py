@@ -0,0 +1,46 @@
+import time
+
+import click
+
+from ..utils import identify_current
+
+
+@click.command("logs")
+@click.argument("name", required=False)
+@click.option("-s", "--suffix")
+@click.option("-d", "--db")
+@click.option("-f", "--follow", is_flag=True, default=False)
+@click.option("-n", "--lines", default=50)
+@click.pass_obj
+@identify_current
+def logs(obj, name, suffix, db, follow, lines):
+    """Show the log of an instance started with `start --detach`."""
+    dbname = db or f"{name}{f'-{suffix}' if suffix else ''}"
+    log = obj.get_log(dbname)
+    if not log.exists():
+        click.echo(f"No log for {dbname}.", err=True)
+        exit(1)
+
+    with open(log, "rb") as file:
+        for line in tail(file, lines):
+            click.echo(line.decode("utf-8", "replace"), nl=False)
+        while follow:
+            line = file.readline()
+            if line:
+                click.echo(line.decode("utf-8", "replace"), nl=False)
+            else:
+                time.sleep(0.2)
+
+
+def tail(file, lines):
+    """Last `lines` lines of `file`, read backwards from its end."""
+    file.seek(0, 2)
+    end = position = file.tell()
+    data = b""
+    while position > 0 and data.count(b"\n") <= lines:
+        step = min(64 * 1024, position)
+        position -= step
+        file.seek(position)
+        data = file.read(step) + data
+    file.seek(end)
+    return data.splitlines(keepends=True)[-lines:]
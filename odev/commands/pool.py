@@ -0,0 +1,42 @@
+import click
+
+from .. import pool as pool_
+
+
+@click.group("pool")
+def pool():
+    """Pre-warmed clones of the basedbs used by `start/test --fresh`."""
+
+
+@pool.command("status")
+@click.pass_obj
+def status(obj):
+    """Show the ready clones of every pooled basedb."""
+    pool_.status(obj)
+
+
+@pool.command("fill")
+@click.argument("basedb", required=False)
+@click.pass_obj
+def fill(obj, basedb):
+    """Create ready clones of BASEDB (default: <current>-basedb)."""
+    basedb = basedb or default_basedb(obj)
+    slots = pool_.fill(obj, basedb)
+    click.echo(f"{basedb}: {len(slots)}/{obj.pool_size} ready")
+
+
+@pool.command("clear")
+@click.argument("basedb", required=False)
+@click.pass_obj
+def clear(obj, basedb):
+    """Drop the ready clones of BASEDB (default: <current>-basedb)."""
+    basedb = basedb or default_basedb(obj)
+    pool_.clear(obj, basedb)
+
+
+def default_basedb(obj):
+    name = obj.identify_name()
+    if not name:
+        click.echo("Please select a dev env name.\ntry: $ odev list")
+        exit(1)
+    return f"{name}-basedb"
@@ -0,0 +1,35 @@
+import click
+
+from .. import prefetch as prefetch_
+
+
+@click.command("prefetch")
+@click.option(
+    "--every", type=int, help="Fetch again every EVERY minutes, until killed."
+)
+@click.option(
+    "--detach",
+    is_flag=True,
+    default=False,
+    help="Run the --every scheduler in the background.",
+)
+@click.pass_obj
+def prefetch(obj, every, detach):
+    """Fetch the base branches of the dev envs ahead of `prepare --pull`.
+
+    One fetch of origin per repo of `src`, for the branches that moved.
+    `prepare --pull` fast-forwards from the fetched branches, without
+    fetching, for `prefetch-max-age` minutes (~/.odev). Run it from cron,
+    or as a scheduler with --every.
+    """
+    if detach and not every:
+        click.echo("--detach needs --every.", err=True)
+        exit(1)
+    if detach:
+        pid = prefetch_.schedule_in_background(every)
+        click.echo(f"prefetching every {every} minutes (pid {pid})")
+        click.echo(f"log: {prefetch_.LOG}")
+    elif every:
+        prefetch_.schedule(obj, every)
+    else:
+        prefetch_.prefetch(obj)
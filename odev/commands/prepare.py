@@ -1,13 +1,11 @@
 import click
-import os
-import json
 
-from ..utils import return_to_cwd, run, get_base_branch
+from ..utils import run, run_in_repos, get_base_branch
 from ..persist import add_to_list
-from ..main import main
+from ..prefetch import is_fresh
 
 # TODO: add a way to prepare from odoo-dev remote (useful for failed forward port)
-@main.command("prepare")
+@click.command("prepare")
 @click.argument("new-branch")
 @click.option("-b", "--base-branch")
 @click.option("-p", "--pull", is_flag=True, default=False)
@@ -32,9 +30,27 @@ def prepare(obj, new_branch, base_branch, pull, from_remote, open_workspace):
     if different_base_branch:
         base_branch = different_base_branch
 
-    create_branch(base_branch, new_branch, odoo_base_worktree_dir, pull, from_remote)
-    create_branch(base_branch, new_branch, ent_base_worktree_dir, pull, from_remote)
-    create_upgrade_branch(new_branch, up_dir, pull, from_remote)
+    def fresh(repo, branch):
+        # fetched by `odev prefetch` recently enough to skip the fetch
+        return pull and is_fresh(obj.src / repo, branch, obj.prefetch_max_age)
+
+    run_in_repos(
+        {
+            odoo_base_worktree_dir: create_branch(
+                base_branch, new_branch, pull, from_remote, fresh("odoo", base_branch)
+            ),
+            ent_base_worktree_dir: create_branch(
+                base_branch,
+                new_branch,
+                pull,
+                from_remote,
+                fresh("enterprise", base_branch),
+            ),
+            up_dir: create_upgrade_branch(
+                new_branch, pull, from_remote, fresh("upgrade", "master")
+            ),
+        }
+    )
 
     add_to_list("all", original_name)
     obj.set_current(original_name)
@@ -43,31 +59,35 @@ def prepare(obj, new_branch, base_branch, pull, from_remote, open_workspace):
         run(["odev", "code"])
 
 
-@return_to_cwd
-def create_branch(base_branch, new_branch, worktree_dir, pull, from_remote):
-    os.chdir(worktree_dir)
-    run(["git", "checkout", base_branch])
+def create_branch(base_branch, new_branch, pull, from_remote, prefetched=False):
+    commands = [["git", "checkout", base_branch]]
     if pull:
-        run(["git", "pull", "origin", base_branch])
-    checkout_new_branch(worktree_dir, new_branch, from_remote)
+        commands.append(update_base_branch(base_branch, prefetched))
+    return commands + checkout_new_branch(new_branch, from_remote)
 
 
-@return_to_cwd
-def create_upgrade_branch(new_branch, src_dir, pull, from_remote):
-    os.chdir(src_dir)
-    run(["git", "checkout", "master"])
+def create_upgrade_branch(new_branch, pull, from_remote, prefetched=False):
+    commands = [["git", "checkout", "master"]]
     if pull:
-        run(["git", "pull", "origin", "master"])
+        commands.append(update_base_branch("master", prefetched))
     if from_remote:
-        run(["git", "fetch", "origin", new_branch])
-        run(["git", "checkout", "-t", f"origin/{new_branch}"])
+        commands.append(["git", "fetch", "origin", new_branch])
+        commands.append(["git", "checkout", "-t", f"origin/{new_branch}"])
     else:
-        run(["git", "checkout", "-b", new_branch])
+        commands.append(["git", "checkout", "-b", new_branch])
+    return commands
+
 
+def update_base_branch(base_branch, prefetched):
+    if prefetched:
+        return ["git", "merge", "--ff-only", f"origin/{base_branch}"]
+    return ["git", "pull", "origin", base_branch]
 
-def checkout_new_branch(worktree_dir, new_branch, from_remote):
+
+def checkout_new_branch(new_branch, from_remote):
     if from_remote:
-        run(["git", "fetch", "odoo-dev", new_branch])
-        run(["git", "checkout", "-t", f"odoo-dev/{new_branch}"])
-    else:
-        run(["git", "checkout", "-b", new_branch])
+        return [
+            ["git", "fetch", "odoo-dev", new_branch],
+            ["git", "checkout", "-t", f"odoo-dev/{new_branch}"],
+        ]
+    return [["git", "checkout", "-b", new_branch]]
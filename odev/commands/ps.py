@@ -0,0 +1,28 @@
+import time
+
+import click
+
+from ..procs import get_instances
+
+
+@click.command("ps")
+@click.option("-a", "--all", is_flag=True, help="Include foreground instances.")
+@click.pass_obj
+def ps(obj, all):
+    """List the odoo instances launched by odev."""
+    instances = {
+        pid: instance
+        for pid, instance in get_instances().items()
+        if all or instance.get("detached")
+    }
+    if not instances:
+        click.echo("No running instance.")
+        return
+    click.echo(f"{'pid':<8}{'port':<7}{'uptime':>9}  {'database':<40}name")
+    for pid, instance in sorted(instances.items()):
+        uptime = int(time.time() - instance.get("started", time.time()))
+        click.echo(
+            f"{pid:<8}{instance.get('port') or '':<7}"
+            f"{uptime // 3600:>3}:{uptime // 60 % 60:02}:{uptime % 60:02}  "
+            f"{instance.get('db'):<40}{instance.get('name')}"
+        )
@@ -1,11 +1,9 @@
 import click
-import os
 
-from ..utils import run, HOME, identify_current, get_base_branch
-from ..main import main
+from ..utils import run_in_repos, identify_current, get_base_branch, get_dbs
 
 
-@main.command("remove")
+@click.command("remove")
 @click.argument("name", required=False)
 @click.option("-d", "--drop-dbs", is_flag=True, default=False)
 @click.pass_obj
@@ -16,15 +14,20 @@ def remove(obj, name, drop_dbs):
     _, ent_base_worktree_dir = obj.get_dirs("enterprise", base_branch)
     upgrade_dir, _ = obj.get_dirs("upgrade", base_branch)
 
-    delete_branch(name, odoo_base_worktree_dir, base_branch)
-    delete_branch(name, ent_base_worktree_dir, base_branch)
-    delete_branch(name, upgrade_dir, base_branch="master")
+    run_in_repos(
+        {
+            odoo_base_worktree_dir: delete_branch(name, base_branch),
+            ent_base_worktree_dir: delete_branch(name, base_branch),
+            upgrade_dir: delete_branch(name, base_branch="master"),
+        }
+    )
     if drop_dbs:
-        run(["odev", "drop", name, "--all"])
+        obj.drop_dbs(get_dbs(name))
     obj.remove_current()
 
 
-def delete_branch(name, repo_dir, base_branch):
-    os.chdir(repo_dir)
-    run(["git", "checkout", base_branch])
-    run(["git", "branch", "-D", name])
+def delete_branch(name, base_branch):
+    return [
+        ["git", "checkout", base_branch],
+        ["git", "branch", "-D", name],
+    ]
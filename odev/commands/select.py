@@ -1,11 +1,9 @@
 import click
-import os
 
-from ..main import main
-from ..utils import run, get_base_branch, return_to_cwd
+from ..utils import run, run_in_repos, get_base_branch
 
 
-@main.command("select")
+@click.command("select")
 @click.option("-s", "--search-string")
 @click.option("-i", "--index", default=0)
 @click.option("-o", "--open-workspace", is_flag=True, default=False)
@@ -29,15 +27,16 @@ def select(obj, search_string, index, open_workspace):
     _, ent_worktree_dir = obj.get_dirs("enterprise", base_branch)
     upgrade_dir, _ = obj.get_dirs("upgrade", base_branch)
 
-    normal_checkout(odoo_worktree_dir, selected)
-    normal_checkout(ent_worktree_dir, selected)
-    normal_checkout(upgrade_dir, selected)
+    run_in_repos(
+        {
+            repo_dir: normal_checkout(selected)
+            for repo_dir in [odoo_worktree_dir, ent_worktree_dir, upgrade_dir]
+        }
+    )
 
     if open_workspace:
         run(["odev", "code"])
 
 
-@return_to_cwd
-def normal_checkout(src_dir, branch):
-    os.chdir(src_dir)
-    run(["git", "checkout", branch])
+def normal_checkout(branch):
+    return [["git", "checkout", branch]]
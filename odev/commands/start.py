@@ -2,11 +2,15 @@ import click
 import os
 
 from ..utils import run, db_exists, identify_current
-from ..main import main
+from .. import pool
+from .. import procs
+from .. import updates
+from .. import ephemeral
+from .. import profiling
 from odev.options import OptionEatAll
 
 
-@main.command("start")
+@click.command("start")
 @click.argument("name", required=False)
 @click.option("-i", "--install-modules")
 @click.option("-u", "--update-modules")
@@ -17,10 +21,42 @@ from odev.options import OptionEatAll
 @click.option("-ne", "--no-enterprise", is_flag=True, default=False)
 @click.option("-nd", "--no-demo", is_flag=True, default=False)
 @click.option("--debug", is_flag=True, default=False)
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help="Load the registry under cProfile and import tracing, then report "
+    "the time spent per addon.",
+)
 @click.option("--fresh", is_flag=True, default=False)
 @click.option("--shell", is_flag=True, default=False)
 @click.option("--populate", is_flag=True, default=False)
+@click.option(
+    "--detach",
+    is_flag=True,
+    default=False,
+    help="Run in the background on a free port, see `odev ps/logs/stop`.",
+)
 @click.option("-d", "--db")
+@click.option(
+    "--auto-update",
+    is_flag=True,
+    default=False,
+    help="Update the modules whose code changed since the database last "
+    "installed/updated them.",
+)
+@click.option(
+    "--ephemeral",
+    is_flag=True,
+    default=False,
+    help="Run in a throwaway PostgreSQL cluster on tmpfs, loaded with the basedb.",
+)
+@click.option(
+    "--minimal-addons/--full-addons",
+    default=None,
+    help="Only put the modules the database needs in the addons path "
+    "(default: minimal-addons in ~/.odev).",
+)
 @click.option(
     "-w",
     "--whatever",
@@ -32,6 +68,7 @@ from odev.options import OptionEatAll
 )
 @click.pass_obj
 @identify_current
+@ephemeral.mode
 def start(
     obj,
     name,
@@ -44,28 +81,72 @@ def start(
     no_enterprise,
     no_demo,
     debug,
+    profile,
     fresh,
     shell,
     populate,
+    detach,
     db,
+    auto_update,
+    minimal_addons,
     whatever,
 ):
+    conflicts = dict(debug=debug, shell=shell, populate=populate, detach=detach)
+    for option, value in conflicts.items():
+        if profile and value:
+            click.echo(f"--profile can't be used with --{option}.", err=True)
+            exit(1)
+
     name = base_worktree if base_worktree else name
     suffix = f"{name}{f'-{suffix}' if suffix else ''}"
     basedb = f"{name}-{basedb if basedb else 'basedb'}"
 
-    if fresh:
-        run(obj.dropdb(suffix))
+    # a new ephemeral cluster only holds the basedb
+    fresh = fresh and not obj.cluster
+    if fresh and obj.pool_size and pool.take(obj, basedb, suffix):
+        pool.fill_in_background(basedb)
+    elif fresh:
+        obj.dropdb(suffix)
         run(obj.drop_filestore(suffix))
-        run(obj.copydb(basedb, suffix))
-        run(obj.copy_filestore(basedb, suffix))
+        obj.copydb(basedb, suffix)
+        obj.clone_filestore(basedb, suffix)
+        if obj.pool_size:
+            pool.fill_in_background(basedb)
     elif not db_exists(suffix):
-        run(obj.copydb(basedb, suffix))
-        run(obj.copy_filestore(basedb, suffix))
+        obj.copydb(basedb, suffix)
+        obj.clone_filestore(basedb, suffix)
 
-    python = obj.get_python()
+    dbname = db or suffix
+    snapshot = None
+    if (auto_update or install_modules or update_modules) and not obj.cluster:
+        snapshot = updates.snapshot(
+            obj,
+            name,
+            dbname,
+            f"{install_modules or ''},{update_modules or ''}",
+            no_enterprise,
+            base_worktree,
+            auto=auto_update,
+        )
+    if auto_update:
+        modules = updates.to_update(snapshot)
+        updates.echo(modules)
+        update_modules = ",".join(filter(None, [update_modules, *(modules or [])]))
+    modules = f"{install_modules or ''},{update_modules or ''}"
+
+    if detach and not port:
+        port = str(procs.free_port(int(obj.port)))
+
+    python = obj.get_python(name, base_worktree)
     odoobin = obj.get_odoo_bin(name, base_worktree)
-    addons = obj.get_addons(name, no_enterprise, base_worktree)
+    addons = obj.get_addons(
+        name,
+        no_enterprise,
+        base_worktree,
+        dbname=dbname,
+        modules=modules,
+        minimal=minimal_addons,
+    )
     command = [python]
 
     if debug:
@@ -78,7 +159,7 @@ def start(
     if populate:
         command += ["populate"]
 
-    command += ["--addons-path", addons, "-d", db or suffix, "-p", port or obj.port]
+    command += ["--addons-path", addons, "-d", dbname, "-p", port or obj.port]
 
     if install_modules:
         command += ["-i", install_modules]
@@ -89,6 +170,27 @@ def start(
     if debug:
         command += ["--limit-time-real", "3600"]
 
+    command += ephemeral.odoo_args(obj)
     command += whatever
 
-    run(command, verbose=True)
+    if detach:
+        # not recorded: the update happens after this command returns, the
+        # next --auto-update updates these modules again
+        log = obj.get_log(dbname)
+        pid = procs.detach(command, log, name, dbname, port)
+        click.echo(f"{dbname} is running on port {port} (pid {pid}), log: {log}")
+        return
+
+    instance = dict(name=name, dbname=dbname, port=port or obj.port)
+    try:
+        if profile:
+            profiling.report(profiling.run(command, instance))
+            return
+        run(
+            command,
+            verbose=True,
+            instance=instance,
+        )
+    finally:
+        if snapshot:
+            updates.record(snapshot, modules)
@@ -0,0 +1,41 @@
+from collections import defaultdict
+
+import click
+
+from .. import trace
+
+
+@click.command("stats")
+@click.option("-c", "--command", "command_name", help="Only this odev command.")
+@click.option("-n", "--top", default=10, help="Steps shown per command.")
+@click.pass_obj
+def stats(obj, command_name, top):
+    """Slowest steps of the recorded odev invocations, per command."""
+    commands = defaultdict(list)
+    steps = defaultdict(lambda: defaultdict(list))
+    for header, records in trace.load():
+        command = header.get("command") or "-"
+        if command_name and command != command_name:
+            continue
+        commands[command].append(header["elapsed"])
+        for record in records:
+            steps[command][record["step"]].append(record["elapsed"])
+
+    if not commands:
+        click.echo(f"No records in {trace.TRACES}.")
+        return
+
+    for command, runs in sorted(commands.items(), key=lambda item: -sum(item[1])):
+        click.echo(
+            f"odev {command}: {len(runs)} runs, "
+            f"avg {sum(runs) / len(runs):.2f}s, max {max(runs):.2f}s"
+        )
+        click.echo(
+            f"    {'step':<32}{'count':>7}{'total':>10}{'avg':>9}{'max':>9}"
+        )
+        by_total = sorted(steps[command].items(), key=lambda item: -sum(item[1]))
+        for step, elapsed in by_total[:top]:
+            click.echo(
+                f"    {step[:31]:<32}{len(elapsed):>7}{sum(elapsed):>9.2f}s"
+                f"{sum(elapsed) / len(elapsed):>8.2f}s{max(elapsed):>8.2f}s"
+            )
@@ -0,0 +1,26 @@
+import click
+
+from ..utils import identify_current
+from ..procs import get_instances, terminate
+
+
+@click.command("stop")
+@click.argument("name", required=False)
+@click.option("-d", "--db", help="Only the instance of this database.")
+@click.option("-a", "--all", is_flag=True, help="Instances of every dev env.")
+@click.option("-t", "--timeout", default=10, help="Seconds before SIGKILL.")
+@click.pass_obj
+@identify_current
+def stop(obj, name, db, all, timeout):
+    """Stop the instances started with `start --detach`."""
+    pids = [
+        pid
+        for pid, instance in get_instances().items()
+        if instance.get("detached")
+        and (all or instance.get("name") == name)
+        and (not db or instance.get("db") == db)
+    ]
+    if not pids:
+        click.echo("No running instance.")
+        return
+    terminate(pids, timeout)
@@ -1,12 +1,19 @@
+import time
+
 import click
-import os
 
 from ..utils import run, db_exists, identify_current
-from ..main import main
+from .. import pool
+from .. import procs
+from .. import testing
+from .. import updates
+from .. import ephemeral
+from .. import profiling
+from .. import sqlprofile
 from odev.options import OptionEatAll
 
 
-@main.command("test")
+@click.command("test")
 @click.argument("name", required=False)
 @click.option("-f", "--test-file")
 @click.option("-t", "--test-tags")
@@ -18,6 +25,40 @@ from odev.options import OptionEatAll
 @click.option("-ne", "--no-enterprise", is_flag=True, default=False)
 @click.option("--debug", is_flag=True, default=False)
 @click.option("--fresh", is_flag=True, default=False)
+@click.option(
+    "-c",
+    "--changed-only",
+    is_flag=True,
+    default=False,
+    help="Only run the modules that changed, or whose dependencies changed, "
+    "since their last green run.",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    default=1,
+    help="Split the test tags (or modules) in shards run concurrently, "
+    "each on its own copy of the basedb.",
+)
+@click.option(
+    "--sql-profile",
+    is_flag=True,
+    default=False,
+    help="Log the queries, then report the top statements overall and the "
+    "likely N+1 per test; the full results are saved for diffing.",
+)
+@click.option(
+    "--ephemeral",
+    is_flag=True,
+    default=False,
+    help="Run in a throwaway PostgreSQL cluster on tmpfs, loaded with the basedb.",
+)
+@click.option(
+    "--minimal-addons/--full-addons",
+    default=None,
+    help="Only put the modules the database needs in the addons path "
+    "(default: minimal-addons in ~/.odev).",
+)
 @click.option(
     "-w",
     "--whatever",
@@ -29,6 +70,7 @@ from odev.options import OptionEatAll
 )
 @click.pass_obj
 @identify_current
+@ephemeral.mode
 def test(
     obj,
     name,
@@ -42,23 +84,151 @@ def test(
     no_enterprise,
     debug,
     fresh,
+    changed_only,
+    jobs,
+    sql_profile,
+    minimal_addons,
     whatever,
 ):
+    if sql_profile and (debug or jobs > 1):
+        option = "--debug" if debug else "--jobs"
+        click.echo(f"--sql-profile can't be used with {option}.", err=True)
+        exit(1)
+
+    specs, excluded, fingerprints = [], [], {}
+    if not test_file and (test_tags or changed_only or jobs > 1):
+        modules = [
+            module
+            for modules in [install_modules, update_modules]
+            for module in (modules or "").split(",")
+            if module
+        ]
+        specs, excluded = testing.parse_specs(test_tags, modules)
+        addons_dirs = obj.get_addons(name, no_enterprise).split(",")
+        fingerprints = testing.spec_fingerprints(addons_dirs, specs)
+    if changed_only:
+        if not specs:
+            raise click.UsageError(
+                "--changed-only needs the modules to check, give -t, -i or -u."
+            )
+        specs = testing.changed_specs(name, specs, fingerprints)
+        if not specs:
+            click.echo("Nothing changed since the last green run.")
+            return
+        test_tags = ",".join(specs + excluded)
+
+    if jobs > 1 and not test_file:
+        return run_sharded(
+            obj,
+            name,
+            specs,
+            excluded,
+            fingerprints,
+            install_modules,
+            update_modules,
+            basedb,
+            port,
+            no_enterprise,
+            jobs,
+            whatever,
+            minimal_addons,
+        )
+
     suffix = f"{name}{f'-{suffix}' if suffix else ''}"
     basedb = f"{name}-{basedb if basedb else 'basedb'}"
 
-    if fresh:
-        run(obj.dropdb(suffix))
+    # a new ephemeral cluster only holds the basedb
+    fresh = fresh and not obj.cluster
+    if fresh and obj.pool_size and pool.take(obj, basedb, suffix):
+        pool.fill_in_background(basedb)
+    elif fresh:
+        obj.dropdb(suffix)
         run(obj.drop_filestore(suffix))
-        run(obj.copydb(basedb, suffix))
-        run(obj.copy_filestore(basedb, suffix))
+        obj.copydb(basedb, suffix)
+        obj.clone_filestore(basedb, suffix)
+        if obj.pool_size:
+            pool.fill_in_background(basedb)
     elif not db_exists(suffix):
-        run(obj.copydb(basedb, suffix))
-        run(obj.copy_filestore(basedb, suffix))
+        obj.copydb(basedb, suffix)
+        obj.clone_filestore(basedb, suffix)
 
-    python = obj.get_python()
+    snapshot = None
+    if (install_modules or update_modules) and not obj.cluster:
+        snapshot = updates.snapshot(
+            obj,
+            name,
+            suffix,
+            f"{install_modules or ''},{update_modules or ''}",
+            no_enterprise,
+        )
+
+    command = odoo_command(
+        obj,
+        name,
+        suffix,
+        port or obj.port,
+        no_enterprise,
+        debug,
+        install_modules,
+        update_modules,
+        test_file,
+        test_tags,
+        whatever,
+        minimal_addons,
+    )
+
+    # debugging keeps the terminal to itself
+    log = None if debug else obj.open_log(suffix)
+    if sql_profile:
+        # echoes all but the queries itself
+        log = sqlprofile.Collector(log)
+        command += sqlprofile.odoo_args()
+    try:
+        success, _, _ = run(
+            command,
+            verbose=not sql_profile,
+            instance=dict(name=name, dbname=suffix, port=port or obj.port),
+            log=log,
+            tail=True,
+        )
+    finally:
+        if log:
+            log.close()
+    if sql_profile:
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = profiling.PROFILES / f"{suffix}-{stamp}-sql.json"
+        log.save(path)
+        log.echo()
+        click.echo(f"\nfull results: {path}")
+    if snapshot:
+        updates.record(snapshot, f"{install_modules or ''},{update_modules or ''}")
+    if success:
+        testing.record_green(name, specs, fingerprints)
+
+
+def odoo_command(
+    obj,
+    name,
+    dbname,
+    port,
+    no_enterprise,
+    debug,
+    install_modules,
+    update_modules,
+    test_file,
+    test_tags,
+    whatever,
+    minimal_addons=None,
+):
+    python = obj.get_python(name)
     odoobin = obj.get_odoo_bin(name)
-    addons = obj.get_addons(name, no_enterprise)
+    addons = obj.get_addons(
+        name,
+        no_enterprise,
+        dbname=dbname,
+        modules=f"{install_modules or ''},{update_modules or ''}",
+        minimal=minimal_addons,
+    )
     command = [python]
 
     if debug:
@@ -70,9 +240,9 @@ def test(
             "--addons-path",
             addons,
             "-d",
-            suffix,
+            dbname,
             "--stop-after-init",
-            "-p", port or obj.port,
+            "-p", port,
         ]
     )
 
@@ -87,6 +257,136 @@ def test(
     if test_tags and not test_file:
         command += ["--test-enable", "--test-tags", test_tags]
 
-    command += whatever
+    return command + ephemeral.odoo_args(obj) + list(whatever)
+
+
+def run_sharded(
+    obj,
+    name,
+    specs,
+    excluded,
+    fingerprints,
+    install_modules,
+    update_modules,
+    basedb,
+    port,
+    no_enterprise,
+    jobs,
+    whatever,
+    minimal_addons=None,
+):
+    basedb = f"{name}-{basedb if basedb else 'basedb'}"
+    shard_specs = testing.split_specs(specs, excluded, jobs)
+    if not shard_specs:
+        click.echo("Nothing to split, give several test tags or modules.", err=True)
+        exit(1)
+
+    start = time.perf_counter()
+    shard_port = int(port or obj.port)
+    template = basedb
+    if install_modules or update_modules:
+        # installed once, the shards are copies of it
+        template = f"{name}-shard-template"
+        shard_port = procs.free_port(shard_port + 1)
+        install(
+            obj,
+            name,
+            basedb,
+            template,
+            str(shard_port),
+            no_enterprise,
+            install_modules,
+            update_modules,
+            whatever,
+            minimal_addons,
+        )
 
-    run(command, verbose=True)
+    shards = []
+    try:
+        for index, (_, shard_tags) in enumerate(shard_specs, start=1):
+            dbname = f"{name}-shard-{index}"
+            obj.dropdb(dbname)
+            run(obj.drop_filestore(dbname))
+            obj.copydb(template, dbname)
+            obj.clone_filestore(template, dbname)
+            # ports are only taken once the shards run, keep them distinct
+            shard_port = procs.free_port(shard_port + 1)
+            command = odoo_command(
+                obj,
+                name,
+                dbname,
+                str(shard_port),
+                no_enterprise,
+                False,
+                None,
+                None,
+                None,
+                shard_tags,
+                whatever,
+                minimal_addons,
+            )
+            click.echo(f"[shard-{index}] {' '.join(command)}")
+            instance = dict(name=name, dbname=dbname, port=str(shard_port))
+            shards.append((f"shard-{index}", command, instance, obj.open_log(dbname)))
+
+        results = testing.run_shards(shards)
+    finally:
+        for _, _, instance, _ in shards:
+            obj.dropdb(instance["dbname"])
+            run(obj.drop_filestore(instance["dbname"]))
+        if template != basedb:
+            obj.dropdb(template)
+            run(obj.drop_filestore(template))
+
+    for (included, _), result in zip(shard_specs, results):
+        if result.success:
+            testing.record_green(name, included, fingerprints)
+
+    if not testing.echo_summary(results, time.perf_counter() - start):
+        exit(1)
+
+
+def install(
+    obj,
+    name,
+    basedb,
+    dbname,
+    port,
+    no_enterprise,
+    install_modules,
+    update_modules,
+    whatever,
+    minimal_addons,
+):
+    """Copy `basedb` to `dbname` and install/update the modules in it."""
+    obj.dropdb(dbname)
+    run(obj.drop_filestore(dbname))
+    obj.copydb(basedb, dbname)
+    obj.clone_filestore(basedb, dbname)
+    command = odoo_command(
+        obj,
+        name,
+        dbname,
+        port,
+        no_enterprise,
+        False,
+        install_modules,
+        update_modules,
+        None,
+        None,
+        whatever,
+        minimal_addons,
+    )
+    with obj.open_log(dbname) as log:
+        success, _, _ = run(
+            command,
+            verbose=True,
+            instance=dict(name=name, dbname=dbname, port=port),
+            log=log,
+            tail=True,
+        )
+    if not success:
+        obj.dropdb(dbname)
+        run(obj.drop_filestore(dbname))
+        click.echo(f"Installing the modules in {dbname} failed.", err=True)
+        exit(1)
@@ -1,15 +1,28 @@
 import click
 import os
 
-from ..utils import run
-from ..main import main
+from ..utils import run_in_repos
+from .. import addons
 
 
-@main.command("worktree")
+@click.command("worktree")
 @click.argument("branch")
 @click.option("--remove", is_flag=True, default=False)
+@click.option(
+    "-m",
+    "--modules",
+    help="Only check out these modules, what they depend on and odoo's core "
+    "(sparse checkout). Default: sparse-modules in ~/.odev.",
+)
+@click.option(
+    "--full",
+    is_flag=True,
+    default=False,
+    help="Check out everything, even if sparse-modules is set.",
+)
 @click.pass_obj
-def worktree(obj, branch, remove):
+def worktree(obj, branch, remove, modules, full):
+    """Create the odoo and enterprise worktrees of BRANCH, concurrently."""
     branch_worktree_dir = obj.worktrees / branch
     odoo_dir = branch_worktree_dir / "odoo"
     ent_dir = branch_worktree_dir / "enterprise"
@@ -24,7 +37,56 @@ def worktree(obj, branch, remove):
     odoo_src = obj.src / "odoo"
     ent_src = obj.src / "enterprise"
 
-    for [wt_dir, src] in [[odoo_dir, odoo_src], [ent_dir, ent_src]]:
-        os.chdir(src)
-        click.echo(f"cd {src}")
-        run(f"git worktree add {wt_dir} {branch}".split(" "))
+    modules = None if full else modules or obj.config.get("sparse-modules")
+    if not modules:
+        run_in_repos(
+            {
+                odoo_src: [["git", "worktree", "add", str(odoo_dir), branch]],
+                ent_src: [["git", "worktree", "add", str(ent_dir), branch]],
+            }
+        )
+        return
+
+    odoo_rev = get_rev(odoo_src, branch)
+    ent_rev = get_rev(ent_src, branch)
+    # enterprise first, like in the addons path
+    index = {
+        name: dict(entry, repo=ent_src)
+        for name, entry in addons.index_at(ent_src, ent_rev, [""]).items()
+    }
+    for name, entry in addons.index_at(odoo_src, odoo_rev, ["addons"]).items():
+        index.setdefault(name, dict(entry, repo=odoo_src))
+    for name, entry in addons.index_at(odoo_src, odoo_rev, ["odoo/addons"]).items():
+        # always checked out with the rest of odoo/
+        index.setdefault(name, dict(entry, repo=None))
+
+    names = addons.required(
+        index, [module for module in modules.split(",") if module]
+    )
+    # the core of odoo, and the files at the root, are always checked out
+    sparse = {odoo_src: ["odoo"], ent_src: []}
+    for name in sorted(names):
+        if index[name]["repo"]:
+            sparse[index[name]["repo"]].append(index[name]["path"])
+
+    run_in_repos(
+        {
+            src: [
+                ["git", "worktree", "add", "--no-checkout", str(wt_dir), branch],
+                ["git", "-C", str(wt_dir), "sparse-checkout", "set", "--cone"]
+                + sparse[src],
+                ["git", "-C", str(wt_dir), "checkout", branch],
+            ]
+            for src, wt_dir in [(odoo_src, odoo_dir), (ent_src, ent_dir)]
+        }
+    )
+    click.echo(
+        f"{len(names)} modules checked out, "
+        "add more with `git sparse-checkout add <module dir>`."
+    )
+
+
+def get_rev(src, branch):
+    # `git worktree add` also accepts a branch only known on the remote
+    is_local, _ = addons.git(["rev-parse", "--verify", "--quiet", branch], src)
+    return branch if is_local else f"origin/{branch}"
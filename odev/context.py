@@ -0,0 +1,311 @@
+import os
+from functools import cached_property
+from pathlib import Path
+
+from . import persist
+
+HOME = Path("~").expanduser()
+DATA = HOME / ".local" / "share" / "odev"
+
+
+class OdevContextObject:
+    # ~/.odev is only read, and its paths expanded, when first needed so that
+    # commands like `odev current` don't pay for it.
+
+    # directory of the ephemeral cluster in use, see `ephemeral.cluster`
+    cluster = None
+
+    @cached_property
+    def config(self):
+        from configparser import ConfigParser
+
+        config = ConfigParser(allow_no_value=True)
+        config.read(HOME / ".odev")
+        return config["DEFAULT"]
+
+    @cached_property
+    def src(self):
+        return Path(self.config.get("src")).expanduser()
+
+    @cached_property
+    def custom_addons_dir(self):
+        custom_addons_dir = self.config.get("custom-addons")
+        if custom_addons_dir:
+            return Path(custom_addons_dir).expanduser()
+        return None
+
+    @cached_property
+    def worktrees(self):
+        return Path(self.config.get("worktrees")).expanduser()
+
+    @cached_property
+    def workspaces(self):
+        return Path(self.config.get("workspaces")).expanduser()
+
+    @cached_property
+    def filestore(self):
+        return Path(self.config.get("filestore")).expanduser()
+
+    @cached_property
+    def port(self):
+        return self.config.get("port")
+
+    @cached_property
+    def pool_size(self):
+        return int(self.config.get("pool-size") or 0)
+
+    @cached_property
+    def basedb_cache_size(self):
+        return float(self.config.get("basedb-cache-gb") or 0) * 1024 ** 3
+
+    @cached_property
+    def minimal_addons(self):
+        return self.config.getboolean("minimal-addons", fallback=False)
+
+    @cached_property
+    def prefetch_max_age(self):
+        return float(self.config.get("prefetch-max-age") or 60) * 60
+
+    def set_current(self, name):
+        persist.save("current", name)
+
+    def remove_current(self):
+        with persist.transaction():
+            current = self.get_current()
+            persist.remove("current")
+            persist.remove_from_list("all", current)
+
+    def get_current(self):
+        return persist.get("current")
+
+    def get_dirs(self, repo, branch):
+        return (self.src / repo, self.worktrees / branch / repo)
+
+    # TODO perhaps we only allow current for the moment
+    def identify_name(self):
+        return self.get_current()
+
+    @cached_property
+    def resolved(self):
+        # base branch -> what `resolve` found for it
+        return {}
+
+    def resolve(self, name, base_branch=None):
+        """Interpreter, odoo-bin and addons of the worktree of `name`.
+
+        Kept in memory per base branch for the rest of the command.
+        """
+        from .utils import get_base_branch
+
+        default_base_branch, _ = get_base_branch(name)
+        base_branch = base_branch if base_branch else default_base_branch
+        if base_branch not in self.resolved:
+            odoo_worktree = self.worktrees / base_branch / "odoo"
+            self.resolved[base_branch] = {
+                "python": self.find_python(base_branch),
+                "odoo_bin": str(odoo_worktree / "odoo-bin"),
+                "enterprise": str(self.worktrees / base_branch / "enterprise"),
+                "addons": [
+                    str(odoo_worktree / "addons"),
+                    str(odoo_worktree / "odoo" / "addons"),
+                ],
+            }
+        return self.resolved[base_branch]
+
+    def find_python(self, base_branch):
+        # `python-<base branch>` in ~/.odev selects e.g. the conda env of that
+        # odoo version, `python` the default one
+        python = self.config.get(f"python-{base_branch}") or self.config.get("python")
+        if python:
+            return str(Path(python).expanduser())
+        import sys
+        import shutil
+
+        return shutil.which("python") or sys.executable
+
+    def get_addons(
+        self,
+        name,
+        no_enterprise=False,
+        base_branch=None,
+        dbname=None,
+        modules=None,
+        minimal=None,
+    ):
+        """Addons path of `name`.
+
+        When `minimal` (default: `minimal-addons` in ~/.odev) and a `dbname`
+        is given, the path only holds the modules installed in it, those in
+        the comma separated `modules` and their dependencies, see
+        `get_minimal_addons`.
+        """
+        resolved = self.resolve(name, base_branch)
+        enterprise = [] if no_enterprise else [resolved["enterprise"]]
+        custom = [str(self.custom_addons_dir)] if self.custom_addons_dir else []
+        addons_dirs = [*enterprise, *resolved["addons"], *custom]
+        minimal = self.minimal_addons if minimal is None else minimal
+        if minimal and dbname:
+            requested = [module for module in (modules or "").split(",") if module]
+            if "all" not in requested:
+                return self.get_minimal_addons(
+                    addons_dirs, resolved["addons"][-1], dbname, requested
+                )
+        return ",".join(addons_dirs)
+
+    def get_minimal_addons(self, addons_dirs, base_dir, dbname, modules):
+        """Symlink farm of the modules needed by `dbname`, followed by `base_dir`.
+
+        odoo always adds its own odoo/addons (base) to the path, so the farm
+        only links the modules of the other addons directories.
+        """
+        import click
+
+        from . import addons
+        from . import db
+        from . import trace
+
+        with trace.span("minimal addons", dbname=dbname) as record:
+            index = self.get_index(addons_dirs)
+            names = addons.required(
+                index, [*db.admin().installed_modules(dbname), *modules]
+            )
+            names = [
+                name
+                for name in names
+                if os.path.dirname(index[name]["path"]) != base_dir
+            ]
+            farm = addons.farm(index, names, DATA / "addons")
+            record.update(modules=len(names), indexed=len(index))
+        click.echo(f"addons path: {len(names)} of {len(index)} modules")
+        return f"{farm},{base_dir}"
+
+    def get_index(self, addons_dirs):
+        import hashlib
+
+        from . import addons
+
+        key = hashlib.sha1(",".join(addons_dirs).encode()).hexdigest()[:12]
+        return addons.index(addons_dirs, DATA / "addons" / f"index-{key}.json")
+
+    def get_python(self, name, base_branch=None):
+        return self.resolve(name, base_branch)["python"]
+
+    def get_odoo_bin(self, name, base_branch=None):
+        return self.resolve(name, base_branch)["odoo_bin"]
+
+    def init_db(self, name, dbname, modules=None, no_demo=None):
+        python = self.get_python(name)
+        odoobin = self.get_odoo_bin(name)
+        command = (
+            [python, odoobin]
+            + [
+                "--addons-path",
+                self.get_addons(name, dbname=dbname, modules=modules),
+            ]
+            + ["-d", dbname]
+            + (["-i", modules] if modules else [])
+            + (["--without-demo", "ALL"] if no_demo else [])
+            + (["--stop-after-init"])
+        )
+        return command
+
+    def list_branches(self, search_string=False):
+        return [
+            branch_name
+            for branch_name in persist.get("all")
+            if (search_string or "") in branch_name
+        ]
+
+    def dropdb(self, dbname):
+        from . import db
+        from . import updates
+
+        success = db.admin().drop(dbname)
+        if success and not self.cluster:
+            updates.forget(dbname)
+        return success
+
+    def createdb(self, dbname):
+        from . import db
+
+        return db.admin().create(dbname)
+
+    def copydb(self, olddbname, newdbname):
+        from . import db
+        from . import updates
+
+        success = db.admin().create(
+            newdbname, template=olddbname, owner=os.environ.get("USER")
+        )
+        if success and not self.cluster:
+            updates.copy(olddbname, newdbname)
+        return success
+
+    def renamedb(self, olddbname, newdbname):
+        from . import db
+        from . import updates
+
+        success = db.admin().rename(olddbname, newdbname)
+        if success and not self.cluster:
+            updates.copy(olddbname, newdbname)
+            updates.forget(olddbname)
+        return success
+
+    def drop_filestore(self, name):
+        return ["rm", "-rf", str(self.filestore / name)]
+
+    def drop_dbs(self, dbnames, workers=4):
+        """Drop `dbnames` concurrently and trash the filestores of the dropped ones.
+
+        The trash is emptied by a background reaper, so this returns as soon
+        as the databases are dropped.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        from . import filestore
+
+        def drop(dbname):
+            dropped = self.dropdb(dbname)
+            # e.g. in use: its attachments are still needed
+            if dropped:
+                filestore.trash(self.filestore / dbname)
+            return dropped
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            dropped = list(executor.map(drop, dbnames))
+        if any(dropped):
+            filestore.reap_in_background(self.filestore)
+        return all(dropped)
+
+    def clone_filestore(self, olddbname, newdbname, src=None):
+        import click
+        import shutil
+
+        from . import filestore
+        from . import trace
+
+        src = Path(src) if src else self.filestore / olddbname
+        dst = self.filestore / newdbname
+        if dst.exists():
+            shutil.rmtree(dst)
+        with trace.span("clone filestore", src=str(src)) as record:
+            stats = filestore.clone(src, dst)
+            record.update(files=stats.files, bytes_avoided=stats.bytes_avoided)
+        click.echo(f"clone filestore {src} -> {dst} : {stats.summary()}")
+        return stats
+
+    def get_log(self, dbname):
+        return DATA / "logs" / f"{dbname}.log"
+
+    def open_log(self, dbname):
+        from . import stream
+
+        return stream.RotatingLog(
+            self.get_log(dbname),
+            max_bytes=int(float(self.config.get("log-size-mb") or 50) * 1024 ** 2),
+            backups=int(self.config.get("log-backups") or 3),
+            compress=self.config.getboolean("log-compress", fallback=False),
+        )
+
+    def get_workspace_dir(self, base_branch):
+        return str(self.workspaces / f"{base_branch}.code-workspace")
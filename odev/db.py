@@ -0,0 +1,232 @@
+import re
+import threading
+import subprocess
+from abc import ABC, abstractmethod
+from functools import lru_cache
+
+import click
+
+from . import trace
+
+try:
+    import psycopg2
+except ImportError:
+    psycopg2 = None
+
+
+def quote_ident(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def quote_literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def is_word_of(subname, dbname):
+    # same matching as the former `psql -l | awk '{print $1}' | grep -w`
+    return re.search(rf"(^|\W){re.escape(subname)}(\W|$)", dbname) is not None
+
+
+class DbError(click.ClickException):
+    """A query failed, e.g. because the server is down."""
+
+
+class DbAdmin(ABC):
+    """Maintenance operations on the PostgreSQL cluster.
+
+    Subclasses implement `query` and `execute`; everything else is plain SQL
+    against the `postgres` maintenance database.
+    """
+
+    @abstractmethod
+    def query(self, sql, dbname="postgres"):
+        """Rows of `sql` run in `dbname`, raises DbError when it fails."""
+
+    @abstractmethod
+    def execute(self, sql):
+        """Run the statement `sql`, echo its outcome and return whether it
+        succeeded."""
+
+    def close(self):
+        """Close the connections kept open, if any."""
+
+    def list(self, subname=None):
+        rows = self.query(
+            "SELECT datname FROM pg_database WHERE datistemplate = false"
+        )
+        names = sorted(row[0] for row in rows)
+        if subname is None:
+            return names
+        return [name for name in names if is_word_of(subname, name)]
+
+    def exists(self, name):
+        rows = self.query(
+            f"SELECT 1 FROM pg_database WHERE datname = {quote_literal(name)}"
+        )
+        return bool(rows)
+
+    def oid(self, name):
+        rows = self.query(
+            f"SELECT oid FROM pg_database WHERE datname = {quote_literal(name)}"
+        )
+        return str(rows[0][0]) if rows else False
+
+    def sizes(self, names=None):
+        rows = self.query(
+            "SELECT datname, pg_database_size(datname) FROM pg_database"
+            " WHERE datistemplate = false"
+        )
+        return {
+            name: int(size) for name, size in rows if names is None or name in names
+        }
+
+    def installed_modules(
+        self, name, states=("installed", "to install", "to upgrade")
+    ):
+        """Modules in one of `states` in the odoo database `name`."""
+        if not self.exists(name):
+            return []
+        rows = self.query("SELECT to_regclass('ir_module_module')", name)
+        if not rows or not rows[0][0]:
+            return []
+        rows = self.query(
+            "SELECT name FROM ir_module_module"
+            f" WHERE state IN ({', '.join(map(quote_literal, states))})",
+            name,
+        )
+        return [row[0] for row in rows]
+
+    def create(self, name, template=None, owner=None):
+        sql = f"CREATE DATABASE {quote_ident(name)}"
+        if owner:
+            sql += f" OWNER {quote_ident(owner)}"
+        if template:
+            sql += f" TEMPLATE {quote_ident(template)}"
+        return self.execute(sql)
+
+    def drop(self, name):
+        return self.execute(f"DROP DATABASE {quote_ident(name)}")
+
+    def rename(self, old, new):
+        return self.execute(
+            f"ALTER DATABASE {quote_ident(old)} RENAME TO {quote_ident(new)}"
+        )
+
+
+class Psycopg2Admin(DbAdmin):
+    """Keeps one connection to `postgres` per thread for the whole odev command.
+
+    Connections to other databases are closed right away, they would
+    otherwise prevent dropping or copying them.
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+        # the connections of every thread, see `close`
+        self.all_connections = []
+
+    @property
+    def connections(self):
+        if not hasattr(self.local, "connections"):
+            self.local.connections = {}
+            self.all_connections.append(self.local.connections)
+        return self.local.connections
+
+    def close(self):
+        for connections in self.all_connections:
+            while connections:
+                connections.popitem()[1].close()
+
+    def connection(self, dbname):
+        if dbname not in self.connections:
+            connection = psycopg2.connect(dbname=dbname)
+            connection.autocommit = True
+            self.connections[dbname] = connection
+        return self.connections[dbname]
+
+    def query(self, sql, dbname="postgres"):
+        with trace.span("sql query", sql=sql) as record:
+            try:
+                with self.connection(dbname).cursor() as cursor:
+                    cursor.execute(sql)
+                    return cursor.fetchall()
+            except psycopg2.Error as error:
+                record["returncode"] = 1
+                raise DbError(f"{sql} : {error.pgerror or error}".strip())
+            finally:
+                if dbname != "postgres" and dbname in self.connections:
+                    self.connections.pop(dbname).close()
+
+    def execute(self, sql):
+        with trace.span(" ".join(sql.split()[:2]), sql=sql) as record:
+            try:
+                with self.connection("postgres").cursor() as cursor:
+                    cursor.execute(sql)
+            except psycopg2.Error as error:
+                record["returncode"] = 1
+                click.echo(f"{sql} : {error.pgerror or error}".strip())
+                return False
+            record["returncode"] = 0
+            click.echo(f"{sql} : 0")
+            return True
+
+
+class PsqlAdmin(DbAdmin):
+    """Fallback through the psql command line tool when no driver is available."""
+
+    def query(self, sql, dbname="postgres"):
+        with trace.span("psql", sql=sql) as record:
+            process = subprocess.run(
+                ["psql", "-d", dbname, "-tA", "-F", "\t", "-c", sql],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+            record["returncode"] = process.returncode
+        if process.returncode:
+            error = process.stderr.decode("utf-8", "replace")
+            raise DbError(f"{sql} : {error}".strip())
+        lines = process.stdout.decode("utf-8").splitlines()
+        return [tuple(line.split("\t")) for line in lines if line]
+
+    def execute(self, sql):
+        return self.run(["psql", "-d", "postgres", "-c", sql])
+
+    def run(self, command):
+        with trace.span(command[0], command=" ".join(command)) as record:
+            process = subprocess.run(
+                command, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
+            record["returncode"] = process.returncode
+        click.echo(f"{' '.join(command)} : {process.returncode}")
+        return process.returncode == 0
+
+    def create(self, name, template=None, owner=None):
+        return self.run(
+            ["createdb"]
+            + (["-O", owner] if owner else [])
+            + (["-T", template] if template else [])
+            + [name]
+        )
+
+    def drop(self, name):
+        return self.run(["dropdb", name])
+
+
+@lru_cache(maxsize=None)
+def admin():
+    if psycopg2:
+        try:
+            backend = Psycopg2Admin()
+            backend.connection("postgres")
+            return backend
+        except psycopg2.Error:
+            pass
+    return PsqlAdmin()
+
+
+def reset():
+    """Close the connections of `admin` and forget it, so that the next call
+    connects again, e.g. to another cluster."""
+    if admin.cache_info().currsize:
+        admin().close()
+    admin.cache_clear()
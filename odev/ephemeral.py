@@ -0,0 +1,164 @@
+import os
+import glob
+import shutil
+import getpass
+import tempfile
+import subprocess
+from contextlib import contextmanager
+from pathlib import Path
+
+import click
+
+from . import db
+from .utils import run
+
+# a throwaway cluster doesn't need to survive a crash
+SETTINGS = {
+    "fsync": "off",
+    "full_page_writes": "off",
+    "synchronous_commit": "off",
+    "listen_addresses": "''",
+}
+PORT = "5432"
+
+
+def find_bin(obj, program):
+    """Path of the PostgreSQL server tool `program` (initdb, pg_ctl).
+
+    They are often not on the PATH, e.g. /usr/lib/postgresql/<v>/bin on
+    Debian. `pg-bin` in ~/.odev sets their directory.
+    """
+    bindirs = []
+    if obj.config.get("pg-bin"):
+        bindirs.append(str(Path(obj.config.get("pg-bin")).expanduser()))
+    if shutil.which("pg_config"):
+        process = subprocess.run(["pg_config", "--bindir"], stdout=subprocess.PIPE)
+        bindirs.append(process.stdout.decode().strip())
+    bindirs += sorted(glob.glob("/usr/lib/postgresql/*/bin"), reverse=True)
+    for bindir in bindirs:
+        path = os.path.join(bindir, program)
+        if os.access(path, os.X_OK):
+            return path
+    return shutil.which(program) or program
+
+
+def get_root(obj):
+    root = obj.config.get("ephemeral-dir")
+    if root:
+        return str(Path(root).expanduser())
+    return "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+@contextmanager
+def cluster(obj, basedb):
+    """Private PostgreSQL cluster on tmpfs holding a copy of `basedb`.
+
+    While in the block, the databases, filestores and odoo-bin (see
+    `odoo_args`) of odev all point to it. It is destroyed at the end.
+    """
+    if not db.admin().exists(basedb):
+        click.echo(f"{basedb} doesn't exist, run `odev basedb` first.", err=True)
+        exit(1)
+
+    directory = tempfile.mkdtemp(prefix="odev-", dir=get_root(obj))
+    data_dir = os.path.join(directory, "data")
+    # libpq, hence psql, pg_restore and psycopg2, reads them
+    env = {"PGHOST": directory, "PGPORT": PORT, "PGUSER": getpass.getuser()}
+    options = " ".join(f"-c {key}={value}" for key, value in SETTINGS.items())
+    previous = {key: os.environ.get(key) for key in env}
+    real_filestore = obj.filestore
+    started = False
+    try:
+        success, _, err = run(
+            [find_bin(obj, "initdb"), "-D", data_dir, "-A", "trust", "-E", "UTF8"]
+            + ["-U", env["PGUSER"], "--no-sync"]
+        )
+        if not success:
+            click.echo(err.decode("utf-8", "replace"), err=True)
+            exit(1)
+        success, _, err = run(
+            [find_bin(obj, "pg_ctl"), "-D", data_dir, "-w", "-l"]
+            + [os.path.join(directory, "postgres.log"), "start"]
+            + ["-o", f"-k {directory} -p {PORT} {options}"]
+        )
+        started = success
+        if not success:
+            click.echo(err.decode("utf-8", "replace"), err=True)
+            exit(1)
+
+        main_env = dict(os.environ)
+        os.environ.update(env)
+        db.reset()
+        obj.cluster = directory
+        obj.filestore = Path(directory) / "filestore"
+        load(basedb, main_env)
+        obj.clone_filestore(basedb, basedb, src=real_filestore / basedb)
+        yield directory
+    finally:
+        obj.cluster = None
+        obj.filestore = real_filestore
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        db.reset()
+        if started:
+            run([find_bin(obj, "pg_ctl"), "-D", data_dir, "-m", "immediate", "stop"])
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def load(basedb, main_env):
+    """Pipe a dump of `basedb` from the main cluster into the ephemeral one."""
+    db.admin().create(basedb)
+    command = f"pg_dump -Fc -Z0 -d {basedb} | pg_restore --no-owner -d {basedb}"
+    click.echo(command)
+    # uncompressed, it is read right away
+    dump = subprocess.Popen(
+        ["pg_dump", "-Fc", "-Z0", "-d", basedb],
+        stdout=subprocess.PIPE,
+        env=main_env,
+    )
+    restore = subprocess.run(
+        ["pg_restore", "--no-owner", "-d", basedb], stdin=dump.stdout
+    )
+    dump.stdout.close()
+    dump.wait()
+    returncode = dump.returncode or restore.returncode
+    click.echo(f"{command} : {returncode}")
+    if returncode:
+        raise click.ClickException(f"{basedb} could not be loaded in the cluster.")
+
+
+def odoo_args(obj):
+    """odoo-bin options pointing it to the ephemeral cluster, if any."""
+    if not obj.cluster:
+        return []
+    return [
+        "--db_host",
+        obj.cluster,
+        "--db_port",
+        PORT,
+        "--db_user",
+        getpass.getuser(),
+        "--data-dir",
+        obj.cluster,
+    ]
+
+
+def mode(func):
+    """Run the start/test command `func` in an ephemeral cluster with --ephemeral."""
+
+    def wrapped(obj, name, *args, **kwargs):
+        if not kwargs.pop("ephemeral"):
+            return func(obj, name, *args, **kwargs)
+        for option in ["detach", "auto_update"]:
+            if kwargs.get(option):
+                option = option.replace("_", "-")
+                click.echo(f"--ephemeral can't be used with --{option}.", err=True)
+                exit(1)
+        basedb = f"{name}-{kwargs.get('basedb') or 'basedb'}"
+        with cluster(obj, basedb):
+            return func(obj, name, *args, **kwargs)
+
+    return wrapped
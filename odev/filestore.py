@@ -0,0 +1,355 @@
+import os
+import sys
+import errno
+import fcntl
+import shutil
+import time
+import hashlib
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# filestores being deleted, inside the filestore root to be on the same device
+TRASH = ".trash"
+# blobs shared by hardlinks between filestores, see `gc`
+STORE = ".store"
+HASH_CHUNK_SIZE = 1024 * 1024
+# filestores changed more recently may belong to a database being created
+ORPHAN_GRACE = 3600
+
+# from linux/fs.h, _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+REFLINK = "reflink"
+HARDLINK = "hardlink"
+COPY = "copy"
+
+# errors meaning "this method is not available here", so we try the next one
+UNSUPPORTED = {
+    errno.EXDEV,
+    errno.EOPNOTSUPP,
+    errno.ENOTTY,
+    errno.EINVAL,
+    errno.EPERM,
+    errno.EMLINK,
+}
+
+
+class CloneStats:
+    def __init__(self):
+        self.files = {REFLINK: 0, HARDLINK: 0, COPY: 0}
+        self.bytes = {REFLINK: 0, HARDLINK: 0, COPY: 0}
+        self.elapsed = 0.0
+
+    @property
+    def bytes_avoided(self):
+        return self.bytes[REFLINK] + self.bytes[HARDLINK]
+
+    @property
+    def total_files(self):
+        return sum(self.files.values())
+
+    def add(self, method, size):
+        self.files[method] += 1
+        self.bytes[method] += size
+
+    def summary(self):
+        methods = ", ".join(
+            f"{method} {count}" for method, count in self.files.items() if count
+        )
+        return (
+            f"{self.total_files} files ({methods or 'empty'}), "
+            f"{human_size(self.bytes_avoided)} not copied, {self.elapsed:.2f}s"
+        )
+
+
+def human_size(size):
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def reflink(src, dst):
+    with open(src, "rb") as rfile, open(dst, "wb") as wfile:
+        try:
+            fcntl.ioctl(wfile.fileno(), FICLONE, rfile.fileno())
+        except OSError:
+            wfile.close()
+            os.unlink(dst)
+            raise
+    shutil.copystat(src, dst)
+
+
+def hardlink(src, dst):
+    os.link(src, dst)
+
+
+def copy(src, dst):
+    shutil.copy2(src, dst)
+
+
+CLONERS = {REFLINK: reflink, HARDLINK: hardlink, COPY: copy}
+
+
+def clone(src, dst, methods=(REFLINK, HARDLINK, COPY), workers=None):
+    """Clone the tree `src` into `dst` (which must not exist).
+
+    Filestore blobs are sha1-addressed and never rewritten in place by Odoo,
+    so sharing their data blocks between databases is safe. Each method in
+    `methods` is tried in order; once one fails as unsupported, it is skipped
+    for the remaining files.
+    """
+    src, dst = Path(src), Path(dst)
+    stats = CloneStats()
+    start = time.perf_counter()
+    if not src.is_dir():
+        stats.elapsed = time.perf_counter() - start
+        return stats
+
+    # one task per directory (<db>/<2 hex>): a task per blob costs more
+    # than linking it
+    directories = []
+    for root, dirs, filenames in os.walk(src):
+        target = os.path.join(dst, os.path.relpath(root, src))
+        os.makedirs(target, exist_ok=True)
+        if filenames:
+            directories.append((root, target, filenames))
+
+    disabled = set()
+
+    def clone_file(src_path, dst_path):
+        for method in methods:
+            if method in disabled:
+                continue
+            try:
+                CLONERS[method](src_path, dst_path)
+            except OSError as error:
+                if error.errno not in UNSUPPORTED or method == methods[-1]:
+                    raise
+                disabled.add(method)
+                continue
+            return method, os.path.getsize(dst_path)
+        raise OSError(errno.EOPNOTSUPP, f"Unable to clone {src_path}")
+
+    def clone_directory(directory):
+        root, target, filenames = directory
+        return [
+            clone_file(os.path.join(root, filename), os.path.join(target, filename))
+            for filename in filenames
+        ]
+
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for results in executor.map(clone_directory, directories):
+            for method, size in results:
+                stats.add(method, size)
+
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def trash(path):
+    """Move the filestore `path` to the trash, see `reap`.
+
+    The rename is atomic: the filestore is gone as soon as this returns.
+    """
+    path = Path(path)
+    trash_dir = path.parent / TRASH
+    trash_dir.mkdir(exist_ok=True)
+    try:
+        os.rename(path, trash_dir / f"{path.name}-{time.time_ns()}")
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def reap(root):
+    """Delete what is in the trash of the filestore `root`.
+
+    Only one reaper works on a trash at a time; the others return at once,
+    as the running one also deletes what was trashed since it started.
+    """
+    trash_dir = Path(root) / TRASH
+    if not trash_dir.is_dir():
+        return
+    with open(trash_dir.parent / f"{TRASH}.lock", "w") as lockfile:
+        try:
+            fcntl.flock(lockfile, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return
+        tried = set()
+        while True:
+            entries = [entry for entry in trash_dir.iterdir() if entry not in tried]
+            if not entries:
+                return
+            for entry in entries:
+                tried.add(entry)
+                shutil.rmtree(entry, ignore_errors=True)
+
+
+def reap_in_background(root):
+    """Start `reap` in its own session, at the lowest CPU and IO priority."""
+    command = [sys.executable, "-m", "odev", "filestore", "reap", str(root)]
+    if shutil.which("ionice"):
+        command = ["ionice", "-c3", *command]
+    subprocess.Popen(
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+        preexec_fn=lambda: os.nice(19),
+    )
+
+
+class GcStats:
+    def __init__(self):
+        self.files = 0
+        self.hashed = 0
+        self.linked = 0
+        self.bytes_linked = 0
+        self.orphans = []
+        self.bytes_orphans = 0
+        self.pruned = 0
+        self.elapsed = 0.0
+
+    def summary(self):
+        return (
+            f"{self.files} files, {self.hashed} hashed, "
+            f"{self.linked} deduplicated ({human_size(self.bytes_linked)}), "
+            f"{len(self.orphans)} orphan filestores "
+            f"({human_size(self.bytes_orphans)}), "
+            f"{self.pruned} unused blobs pruned, "
+            f"{human_size(self.bytes_linked + self.bytes_orphans)} reclaimed, "
+            f"{self.elapsed:.2f}s"
+        )
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        while True:
+            chunk = file.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def unshared_size(path):
+    """Bytes freed by deleting the tree `path`: files not linked elsewhere."""
+    total = 0
+    for root, _, filenames in os.walk(path):
+        for filename in filenames:
+            stat = os.lstat(os.path.join(root, filename))
+            if stat.st_nlink == 1:
+                total += stat.st_size
+    return total
+
+
+def gc(root, dbnames, workers=None, dry_run=False):
+    """Deduplicate the filestores of `root` and remove those of dropped dbs.
+
+    The filestores of databases not in `dbnames` are trashed, see `trash`,
+    unless they changed in the last ORPHAN_GRACE seconds.
+    Every other blob is hashed, in parallel, and replaced by a hardlink to
+    its copy in the content store `<root>/.store`, created from the first
+    blob with that content. Odoo names blobs after the sha1 of their
+    content: blobs already linked to the store are not hashed again, and
+    those whose content doesn't match their name (e.g. being written) are
+    left alone. Store entries no filestore links to anymore are pruned.
+    """
+    root = Path(root)
+    store = root / STORE
+    stats = GcStats()
+    start = time.perf_counter()
+
+    filestores = [
+        entry
+        for entry in root.iterdir()
+        if entry.is_dir() and not entry.name.startswith(".")
+    ]
+    recent = time.time() - ORPHAN_GRACE
+    for path in filestores:
+        if path.name not in dbnames and path.stat().st_mtime < recent:
+            stats.orphans.append(path.name)
+            stats.bytes_orphans += unshared_size(path)
+            if not dry_run:
+                trash(path)
+
+    def scan_file(filepath):
+        # (path, inode, links, size, sha1 or None when there's nothing to do)
+        filename = os.path.basename(filepath)
+        stat = os.lstat(filepath)
+        try:
+            stored = os.lstat(store / filename[:2] / filename)
+        except (FileNotFoundError, NotADirectoryError):
+            stored = None
+        if stored and stored.st_ino == stat.st_ino:
+            sha = None
+        else:
+            sha = file_hash(filepath)
+        return filepath, stat.st_ino, stat.st_nlink, stat.st_size, sha
+
+    def scan(path):
+        # one task per hash directory (<db>/<2 hex>), to spread big filestores
+        if not path.is_dir():
+            return [scan_file(str(path))]
+        return [
+            scan_file(os.path.join(dirpath, filename))
+            for dirpath, _, filenames in os.walk(path)
+            for filename in filenames
+        ]
+
+    tasks = [
+        subpath
+        for path in filestores
+        if path.name in dbnames
+        for subpath in path.iterdir()
+    ]
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        scanned = [item for items in executor.map(scan, tasks) for item in items]
+
+    # inode of the store entry of each content
+    canonical = {}
+    for filepath, inode, links, size, sha in scanned:
+        stats.files += 1
+        if sha is None:
+            continue
+        stats.hashed += 1
+        if os.path.basename(filepath) != sha:
+            continue
+        target = store / sha[:2] / sha
+        if sha not in canonical:
+            try:
+                canonical[sha] = os.lstat(target).st_ino
+            except FileNotFoundError:
+                canonical[sha] = inode
+                if not dry_run:
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    os.link(filepath, target)
+                continue
+        if canonical[sha] == inode:
+            continue
+        stats.linked += 1
+        if links == 1:
+            stats.bytes_linked += size
+        if not dry_run:
+            temp = f"{filepath}.odev-gc"
+            os.link(target, temp)
+            os.replace(temp, filepath)
+
+    if store.is_dir():
+        for dirpath, _, filenames in os.walk(store):
+            for filename in filenames:
+                filepath = os.path.join(dirpath, filename)
+                if os.lstat(filepath).st_nlink == 1:
+                    stats.pruned += 1
+                    if not dry_run:
+                        os.unlink(filepath)
+
+    stats.elapsed = time.perf_counter() - start
+    return stats
@@ -1,13 +1,60 @@
 import click
-import os
+import importlib
 
-from .utils import OdevContextObject
+from . import trace
+from .context import OdevContextObject
 
 
-@click.group()
+class LazyGroup(click.Group):
+    """Group that imports the module of a subcommand only when it is invoked.
+
+    `lazy_commands` maps a command name to "<module>.<attribute>", relative to
+    the odev package.
+    """
+
+    def __init__(self, *args, lazy_commands=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = lazy_commands or {}
+
+    def list_commands(self, ctx):
+        return sorted([*super().list_commands(ctx), *self.lazy_commands])
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name not in self.lazy_commands:
+            return super().get_command(ctx, cmd_name)
+        module_name, attr = self.lazy_commands[cmd_name].rsplit(".", 1)
+        module = importlib.import_module(f".{module_name}", __package__)
+        return getattr(module, attr)
+
+
+@click.group(
+    cls=LazyGroup,
+    lazy_commands={
+        "prepare": "commands.prepare.prepare",
+        "basedb": "commands.basedb.basedb",
+        "start": "commands.start.start",
+        "test": "commands.test.test",
+        "remove": "commands.remove.remove",
+        "drop": "commands.drop.drop",
+        "list": "commands.list_.list_",
+        "cd": "commands.cd.cd",
+        "import": "commands.import_.import_",
+        "listdb": "commands.listdb.listdb",
+        "kill": "commands.kill.kill",
+        "select": "commands.select.select",
+        "current": "commands.current.current",
+        "code": "commands.code.code",
+        "worktree": "commands.worktree.worktree",
+        "pool": "commands.pool.pool",
+        "ps": "commands.ps.ps",
+        "logs": "commands.logs.logs",
+        "stop": "commands.stop.stop",
+        "stats": "commands.stats.stats",
+        "filestore": "commands.filestore.filestore",
+        "prefetch": "commands.prefetch.prefetch",
+    },
+)
 @click.pass_context
 def main(ctx):
+    trace.start(ctx.invoked_subcommand)
     ctx.obj = OdevContextObject()
-
-
-from . import commands
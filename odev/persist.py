@@ -1,69 +1,111 @@
+import os
 import json
+import fcntl
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 
 
 HOME = Path("~").expanduser()
 jsonfile = HOME / ".odev.json"
+lockfile = HOME / ".odev.json.lock"
 
+# state as read by this process, loaded on the first `get`
+_state = None
+# state being modified by the running `transaction` of each thread
+_local = threading.local()
 
-def save(key, val):
-    if not jsonfile.exists():
-        with open(jsonfile, "w+") as file:
-            file.write("{}")
 
-    with open(jsonfile) as rfile:
-        obj = json.load(rfile) or dict()
+def _read():
+    try:
+        with open(jsonfile) as rfile:
+            return json.load(rfile) or dict()
+    except FileNotFoundError:
+        return dict()
 
-    with open(jsonfile, "w") as wfile:
-        obj[key] = val
-        json.dump(obj, wfile)
 
+def _write(obj):
+    import tempfile
 
-def remove(key):
-    if not jsonfile.exists():
+    # write next to the real file and rename it in place so that readers
+    # never see a truncated file
+    fd, tmpname = tempfile.mkstemp(dir=HOME, prefix=".odev.json.")
+    try:
+        with os.fdopen(fd, "w") as wfile:
+            json.dump(obj, wfile)
+            wfile.flush()
+            os.fsync(wfile.fileno())
+        os.replace(tmpname, jsonfile)
+    except BaseException:
+        os.unlink(tmpname)
+        raise
+
+
+@contextmanager
+def transaction():
+    """Group mutations into a single locked read-modify-write of the state file.
+
+    The file is re-read under an exclusive lock, so concurrent odev processes
+    never overwrite each other's changes. Nested transactions join the
+    outermost one, which writes the file once when it exits.
+    """
+    global _state
+    pending = getattr(_local, "pending", None)
+    if pending is not None:
+        yield pending
         return
 
-    with open(jsonfile) as rfile:
-        obj = json.load(rfile) or dict()
+    with open(lockfile, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        _local.pending = _read()
+        try:
+            yield _local.pending
+            _write(_local.pending)
+            _state = _local.pending
+        finally:
+            _local.pending = None
+
 
-    with open(jsonfile, "w") as file:
+def _load():
+    global _state
+    pending = getattr(_local, "pending", None)
+    if pending is not None:
+        return pending
+    if _state is None:
+        _state = _read()
+    return _state
+
+
+def reload():
+    """Forget the cached state, the next `get` reads the file again."""
+    global _state
+    _state = None
+
+
+def save(key, val):
+    with transaction() as obj:
+        obj[key] = val
+
+
+def remove(key):
+    with transaction() as obj:
         obj[key] = False
-        json.dump(obj, file)
 
 
 def get(key):
-    with open(jsonfile) as file:
-        obj = json.load(file)
-        return obj.get(key, False)
+    return _load().get(key, False)
 
 
 def add_to_list(key, value_to_add):
-    if not jsonfile.exists():
-        with open(jsonfile, "w+") as file:
-            file.write("{}")
-
-    with open(jsonfile) as rfile:
-        obj = json.load(rfile) or dict()
-
-    with open(jsonfile, "w") as wfile:
+    with transaction() as obj:
         if not obj.get(key, False):
             obj[key] = []
         if value_to_add not in obj[key]:
             obj[key].append(value_to_add)
-        json.dump(obj, wfile)
 
 
 def remove_from_list(key, value_to_remove):
-    if not jsonfile.exists():
-        with open(jsonfile, "w+") as file:
-            file.write("{}")
-
-    with open(jsonfile) as rfile:
-        obj = json.load(rfile) or dict()
-
-    with open(jsonfile, "w") as wfile:
+    with transaction() as obj:
         if not obj.get(key, False):
-            json.dump(obj, wfile)
             return
         obj[key] = [val for val in obj[key] if val != value_to_remove]
-        json.dump(obj, wfile)
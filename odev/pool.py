@@ -0,0 +1,154 @@
+import os
+import sys
+import uuid
+import fcntl
+import subprocess
+from contextlib import contextmanager
+
+import click
+
+from . import db
+from . import persist
+from .context import DATA
+from .utils import run, db_exists
+
+
+def get_pools():
+    return persist.get("pool") or dict()
+
+
+def get_slots(basedb):
+    return get_pools().get(basedb, {}).get("slots", [])
+
+
+def ready_slots(basedb):
+    # slots may have been taken by other odev processes meanwhile
+    persist.reload()
+    return get_slots(basedb)
+
+
+def set_pool(basedb, oid, slots):
+    pools = get_pools()
+    if slots:
+        pools[basedb] = {"oid": oid, "slots": slots}
+    else:
+        pools.pop(basedb, None)
+    persist.save("pool", pools)
+
+
+def basedb_oid(basedb):
+    return db.admin().oid(basedb)
+
+
+def slot_name(basedb):
+    return f"{basedb}-pool-{uuid.uuid4().hex[:8]}"
+
+
+@contextmanager
+def fill_lock(basedb):
+    DATA.mkdir(parents=True, exist_ok=True)
+    with open(DATA / f"pool-{basedb}.lock", "w") as lockfile:
+        try:
+            fcntl.flock(lockfile, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+
+
+def take(obj, basedb, dbname):
+    """Move a ready slot of `basedb` into place as `dbname`.
+
+    Returns False when there is no usable slot, in which case the caller
+    should clone from `basedb` itself.
+    """
+    oid = basedb_oid(basedb)
+    if not oid:
+        return False
+    with persist.transaction():
+        pool = get_pools().get(basedb, {})
+        slots = pool.get("slots", [])
+        if pool.get("oid") != oid or not slots:
+            return False
+        slot = slots.pop(0)
+        set_pool(basedb, oid, slots)
+
+    obj.dropdb(dbname)
+    run(obj.drop_filestore(dbname))
+    success = obj.renamedb(slot, dbname)
+    if not success:
+        obj.dropdb(slot)
+        run(obj.drop_filestore(slot))
+        return False
+    slot_filestore = obj.filestore / slot
+    if slot_filestore.exists():
+        os.rename(slot_filestore, obj.filestore / dbname)
+    return True
+
+
+def evict(obj, basedb, slots):
+    for slot in slots:
+        obj.dropdb(slot)
+        run(obj.drop_filestore(slot))
+
+
+def fill(obj, basedb):
+    """Evict stale slots of `basedb` and create new ones up to the pool size.
+
+    Only one fill runs per basedb; `take` never waits for it since the state
+    file is only locked while a ready slot is recorded.
+    """
+    with fill_lock(basedb) as locked:
+        if not locked:
+            return ready_slots(basedb)
+        oid = basedb_oid(basedb)
+        with persist.transaction():
+            pool = get_pools().get(basedb, {})
+            slots = pool.get("slots", [])
+            if oid and pool.get("oid") == oid:
+                ready = [slot for slot in slots if db_exists(slot)]
+            else:
+                # basedb was dropped or rebuilt since these slots were cloned
+                ready = []
+            set_pool(basedb, oid, ready)
+        evict(obj, basedb, [slot for slot in slots if slot not in ready])
+
+        while oid and len(ready_slots(basedb)) < obj.pool_size:
+            slot = slot_name(basedb)
+            success = obj.copydb(basedb, slot)
+            if not success:
+                break
+            obj.clone_filestore(basedb, slot)
+            with persist.transaction():
+                set_pool(basedb, oid, get_slots(basedb) + [slot])
+        return ready_slots(basedb)
+
+
+def fill_in_background(basedb):
+    subprocess.Popen(
+        [sys.executable, "-m", "odev", "pool", "fill", basedb],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def clear(obj, basedb):
+    with persist.transaction():
+        slots = get_slots(basedb)
+        set_pool(basedb, False, [])
+    evict(obj, basedb, slots)
+
+
+def status(obj):
+    pools = get_pools()
+    if not pools:
+        click.echo(f"No ready clones (pool-size = {obj.pool_size}).")
+    for basedb, pool in pools.items():
+        stale = pool.get("oid") != basedb_oid(basedb)
+        slots = pool.get("slots", [])
+        marker = " (stale)" if stale else ""
+        click.echo(f"{basedb}: {len(slots)}/{obj.pool_size} ready{marker}")
+        for slot in slots:
+            click.echo(f"    {slot}")
@@ -0,0 +1,150 @@
+import os
+import sys
+import time
+import fcntl
+import traceback
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+
+from . import persist
+from .addons import git
+from .context import DATA
+from .utils import run, get_base_branch
+
+REMOTE = "origin"
+LOCK = DATA / "prefetch.lock"
+LOG = DATA / "logs" / "prefetch.log"
+
+
+def get_prefetched():
+    # repo dir -> {branch: {"sha": fetched commit, "time": when it was checked}}
+    return persist.get("prefetched") or dict()
+
+
+def tracked(obj):
+    """Branches of origin to prefetch in each repo of obj.src: the base
+    branches of the dev envs in ~/.odev.json, master for upgrade."""
+    bases = sorted({get_base_branch(name)[0] for name in persist.get("all") or []})
+    repos = {
+        obj.src / "odoo": bases,
+        obj.src / "enterprise": bases,
+        obj.src / "upgrade": ["master"],
+    }
+    return {repo: branches for repo, branches in repos.items() if branches}
+
+
+def fetch(repo_dir, branches):
+    """Fetch the `branches` of origin that moved, in a single `git fetch`.
+
+    `git ls-remote` tells which ones moved, and the branches that don't
+    exist on origin are left out. Returns the commit of each branch.
+    """
+    ok, out = git(
+        ["ls-remote", "--heads", REMOTE, *[f"refs/heads/{b}" for b in branches]],
+        repo_dir,
+    )
+    if not ok:
+        return None
+    remote = {}
+    for line in out.splitlines():
+        sha, ref = line.split("\t")
+        remote[ref[len("refs/heads/"):]] = sha
+    _, out = git(
+        ["for-each-ref", "--format=%(objectname) %(refname)", f"refs/remotes/{REMOTE}"],
+        repo_dir,
+    )
+    local = {}
+    for line in out.splitlines():
+        sha, ref = line.split(" ")
+        local[ref[len(f"refs/remotes/{REMOTE}/"):]] = sha
+    moved = sorted(branch for branch, sha in remote.items() if local.get(branch) != sha)
+    if moved:
+        refspecs = [f"+refs/heads/{b}:refs/remotes/{REMOTE}/{b}" for b in moved]
+        success, _, _ = run(
+            ["git", "fetch", "--no-tags", REMOTE, *refspecs], cwd=repo_dir, quiet=True
+        )
+        if not success:
+            return None
+    return remote, moved
+
+
+def prefetch(obj):
+    """Fetch the tracked branches of all the repos concurrently."""
+    repos = tracked(obj)
+
+    def target(item):
+        repo_dir, branches = item
+        return fetch(repo_dir, branches) if repo_dir.is_dir() else None
+
+    with ThreadPoolExecutor(max_workers=len(repos) or 1) as executor:
+        results = dict(zip(repos, executor.map(target, repos.items())))
+
+    now = time.time()
+    with persist.transaction():
+        prefetched = get_prefetched()
+        for repo_dir, result in results.items():
+            if result:
+                prefetched.setdefault(str(repo_dir), {}).update(
+                    {
+                        branch: {"sha": sha, "time": now}
+                        for branch, sha in result[0].items()
+                    }
+                )
+        persist.save("prefetched", prefetched)
+
+    for repo_dir, result in results.items():
+        if result is None:
+            click.echo(f"{repo_dir}: fetch failed", err=True)
+        else:
+            remote, moved = result
+            click.echo(
+                f"{repo_dir}: {len(moved)} fetched, {len(remote) - len(moved)} "
+                f"up to date"
+            )
+
+
+def is_fresh(repo_dir, branch, max_age):
+    """Whether origin/`branch` was fetched in `repo_dir` less than `max_age`
+    seconds ago, in which case it can be used without fetching it again."""
+    entry = get_prefetched().get(str(repo_dir), {}).get(branch)
+    return bool(entry) and time.time() - entry["time"] <= max_age
+
+
+def schedule(obj, every):
+    """Prefetch every `every` minutes until killed; a single scheduler runs."""
+    LOCK.parent.mkdir(parents=True, exist_ok=True)
+    with open(LOCK, "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            click.echo("odev prefetch is already running.")
+            return
+        while True:
+            click.echo(time.strftime("%Y-%m-%d %H:%M:%S"))
+            # pick up the dev envs added since the last round
+            persist.reload()
+            try:
+                prefetch(obj)
+            except Exception:
+                # e.g. ~/.odev.json being unreadable, the next round may work
+                click.echo(traceback.format_exc(), err=True)
+            sys.stdout.flush()
+            sys.stderr.flush()
+            time.sleep(every * 60)
+
+
+def schedule_in_background(every):
+    """Start `schedule` in its own session, logging to LOG."""
+    LOG.parent.mkdir(parents=True, exist_ok=True)
+    with open(LOG, "ab") as log:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "odev", "prefetch", "--every", str(every)],
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+            preexec_fn=lambda: os.nice(19),
+        )
+    return process.pid
@@ -0,0 +1,169 @@
+import os
+import time
+import socket
+import signal
+import subprocess
+from pathlib import Path
+
+import click
+
+from . import persist
+
+PROC = Path("/proc")
+
+
+def read_cmdline(pid):
+    try:
+        raw = (PROC / str(pid) / "cmdline").read_bytes()
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        return []
+    return raw.decode("utf-8", "replace").split("\0")[:-1]
+
+
+def is_odoo_bin(cmdline):
+    return (
+        bool(cmdline)
+        and "python" in os.path.basename(cmdline[0])
+        and any(os.path.basename(arg) == "odoo-bin" for arg in cmdline[1:])
+    )
+
+
+def get_dbname(cmdline):
+    for i, arg in enumerate(cmdline):
+        if arg in ("-d", "--database") and i + 1 < len(cmdline):
+            return cmdline[i + 1]
+        if arg.startswith("--database="):
+            return arg.split("=", 1)[1]
+    return False
+
+
+def get_instances():
+    """Odoo processes launched by odev that are still running, by pid."""
+    instances = persist.get("instances") or dict()
+    return {
+        int(pid): instance
+        for pid, instance in instances.items()
+        if is_odoo_bin(read_cmdline(pid))
+    }
+
+
+def register(pid, name, dbname, port=None, **extra):
+    with persist.transaction():
+        instances = {
+            str(pid): instance for pid, instance in get_instances().items()
+        }
+        instances[str(pid)] = {
+            "name": name,
+            "db": dbname,
+            "port": port,
+            "started": time.time(),
+            **extra,
+        }
+        persist.save("instances", instances)
+
+
+def unregister(pid):
+    with persist.transaction():
+        instances = persist.get("instances") or dict()
+        instances.pop(str(pid), None)
+        persist.save("instances", instances)
+
+
+def odoo_bin_proc_ids(name=False):
+    """Pids of the running odoo-bin processes, read from /proc.
+
+    With `name`, only the processes of that dev env: the ones odev recorded
+    for it, and the ones using its database or one of its suffixed databases.
+    """
+    instances = get_instances()
+    pids = []
+    for entry in PROC.iterdir():
+        if not entry.name.isdigit():
+            continue
+        pid = int(entry.name)
+        cmdline = read_cmdline(pid)
+        if not is_odoo_bin(cmdline):
+            continue
+        dbname = get_dbname(cmdline) or ""
+        if (
+            not name
+            or instances.get(pid, {}).get("name") == name
+            or dbname == name
+            or dbname.startswith(f"{name}-")
+        ):
+            pids.append(pid)
+    return sorted(pids)
+
+
+def terminate(pids, timeout=10):
+    """SIGTERM all `pids` at once, SIGKILL the ones still alive after `timeout`."""
+    signalled = set()
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGTERM)
+            signalled.add(pid)
+        except ProcessLookupError:
+            pass
+        except PermissionError:
+            click.echo(f"kill {pid} : not permitted", err=True)
+
+    alive = set(signalled)
+    deadline = time.monotonic() + timeout
+    while alive and time.monotonic() < deadline:
+        time.sleep(0.1)
+        alive = {pid for pid in alive if is_running(pid)}
+
+    for pid in alive:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    for pid in sorted(signalled):
+        click.echo(f"kill {pid} : {'SIGKILL' if pid in alive else 'SIGTERM'}")
+    return signalled
+
+
+def is_running(pid):
+    try:
+        # reap our own children so they don't linger as zombies
+        os.waitpid(pid, os.WNOHANG)
+    except ChildProcessError:
+        pass
+    try:
+        state = (PROC / str(pid) / "stat").read_text().rsplit(")", 1)[1].split()[0]
+    except (FileNotFoundError, ProcessLookupError):
+        return False
+    return state != "Z"
+
+
+def free_port(start):
+    """First port from `start` that no instance uses and that can be bound."""
+    used = {str(instance.get("port")) for instance in get_instances().values()}
+    port = start
+    while True:
+        if str(port) not in used:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                try:
+                    sock.bind(("", port))
+                    return port
+                except OSError:
+                    pass
+        port += 1
+
+
+def detach(command, log, name, dbname, port):
+    """Launch `command` in its own session with its output appended to `log`."""
+    log.parent.mkdir(parents=True, exist_ok=True)
+    with open(log, "ab") as logfile:
+        logfile.write(f"\n$ {' '.join(command)}\n".encode())
+        logfile.flush()
+        process = subprocess.Popen(
+            command,
+            stdin=subprocess.DEVNULL,
+            stdout=logfile,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+    register(process.pid, name, dbname, port, log=str(log), detached=True)
+    return process.pid
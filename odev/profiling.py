@@ -0,0 +1,146 @@
+import re
+import io
+import time
+import pstats
+import subprocess
+from datetime import datetime
+
+import click
+
+from . import procs
+from . import trace
+from .context import DATA
+
+PROFILES = DATA / "profiles"
+
+# "import time:       123 |       4567 |   odoo.addons.sale.models"
+IMPORT_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)")
+# "2024-05-01 10:00:00,123 4242 INFO db odoo.modules.loading: loading sale/a.xml"
+LOG_RE = re.compile(
+    r"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3}) \d+ \w+ \S+ ([\w.]+): (.*)$"
+)
+MODULE_RE = re.compile(r"^Loading module (\w+) \(\d+/\d+\)")
+DATA_RE = re.compile(r"^loading (\w+)/(\S+)")
+LOADED_RE = re.compile(r"^\d+ modules loaded in ")
+
+
+def profile_command(command, directory):
+    """`command` (python odoo-bin ...) run under cProfile and import tracing.
+
+    odoo stops once the registry is loaded and logs when each module starts
+    loading, which `parse` needs to split the time per addon.
+    """
+    python, *args = command
+    if "--stop-after-init" not in args:
+        args.append("--stop-after-init")
+    return (
+        [python, "-X", "importtime", "-m", "cProfile"]
+        + ["-o", str(directory / "odoo.prof")]
+        + args
+        + ["--log-handler", "odoo.modules.loading:DEBUG"]
+    )
+
+
+def run(command, instance):
+    """Run the profiled `command`, its output goes to `odoo.log` in the
+    directory of the profile; returns that directory."""
+    directory = PROFILES / f"{instance['dbname']}-{time.strftime('%Y%m%d-%H%M%S')}"
+    directory.mkdir(parents=True)
+    command = profile_command(command, directory)
+    click.echo(" ".join(command))
+    click.echo(f"profiling, output in {directory / 'odoo.log'}")
+    with open(directory / "odoo.log", "wb") as log:
+        with trace.span("odoo-bin", command=" ".join(command)) as record:
+            process = subprocess.Popen(
+                command, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL
+            )
+            procs.register(process.pid, **instance)
+            try:
+                record["returncode"] = process.wait()
+            finally:
+                procs.unregister(process.pid)
+    return directory
+
+
+def parse(log):
+    """Milliseconds spent importing, setting up and loading the data of each
+    addon, from the importtime lines and the module loading logs of `log`.
+
+    The time between two log lines goes to the module being loaded, or to
+    the module of the data file being loaded, minus the import of the
+    module: odoo imports it after logging that it starts loading it.
+    """
+    addons = {}
+
+    def addon(name):
+        return addons.setdefault(name, {"import": 0.0, "models": 0.0, "data": 0.0})
+
+    current = None
+    last = None
+    with open(log, encoding="utf-8", errors="replace") as file:
+        for line in file:
+            match = IMPORT_RE.match(line)
+            if match:
+                parts = match.group(3).split(".")
+                if parts[:2] == ["odoo", "addons"] and len(parts) == 3:
+                    # cumulative: the addon and what it imported first
+                    elapsed = int(match.group(2)) / 1000
+                    addon(parts[2])["import"] += elapsed
+                    if parts[2] == current:
+                        addon(current)["models"] -= elapsed
+                continue
+            match = LOG_RE.match(line)
+            if not match:
+                continue
+            stamp = datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S,%f")
+            stamp = stamp.timestamp() * 1000
+            if last:
+                addon(last[1])[last[2]] += stamp - last[0]
+                last = None
+            loading = match.group(2) == "odoo.modules.loading"
+            message = match.group(3)
+            if loading and MODULE_RE.match(message):
+                current = MODULE_RE.match(message).group(1)
+            elif loading and LOADED_RE.match(message):
+                current = None
+            if loading and DATA_RE.match(message):
+                last = (stamp, DATA_RE.match(message).group(1), "data")
+            elif current:
+                last = (stamp, current, "models")
+
+    for times in addons.values():
+        times["models"] = max(0.0, times["models"])
+    return addons
+
+
+def report(directory, top=25):
+    addons = parse(directory / "odoo.log")
+    lines = [f"{'addon':<40}{'import':>10}{'models':>10}{'data':>10}{'total':>10}"]
+    totals = {"import": 0.0, "models": 0.0, "data": 0.0}
+    ranked = sorted(addons.items(), key=lambda item: -sum(item[1].values()))
+    for name, times in ranked[:top]:
+        lines.append(
+            f"{name:<40}"
+            + "".join(f"{times[key]:>8.0f}ms" for key in totals)
+            + f"{sum(times.values()):>8.0f}ms"
+        )
+    for times in addons.values():
+        for key in totals:
+            totals[key] += times[key]
+    lines.append(
+        f"{f'total ({len(addons)} addons)':<40}"
+        + "".join(f"{totals[key]:>8.0f}ms" for key in totals)
+        + f"{sum(totals.values()):>8.0f}ms"
+    )
+
+    profile = directory / "odoo.prof"
+    if profile.exists():
+        output = io.StringIO()
+        stats = pstats.Stats(str(profile), stream=output)
+        stats.sort_stats("tottime").print_stats(15)
+        lines += ["", output.getvalue().strip()]
+
+    text = "\n".join(lines) + "\n"
+    (directory / "report.txt").write_text(text)
+    click.echo(text)
+    click.echo(f"raw profile: {profile} (e.g. `python -m pstats {profile}`)")
@@ -0,0 +1,171 @@
+import re
+import json
+import threading
+
+import click
+
+# "2024-05-01 10:00:00,123 4242 DEBUG db odoo.sql_db: [0.152 ms] query: SELECT"
+LOG_RE = re.compile(
+    r"^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3} \d+ \w+ \S+ ([\w.]+): (.*)$"
+)
+# odoo < 13 doesn't log the duration
+QUERY_RE = re.compile(r"^(?:\[([\d.]+) ms\] )?query: (.*)$")
+TEST_RE = re.compile(r"^Starting (\w+\.\w+) \.\.\.")
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+VALUES_RE = re.compile(r"\(\?\.\.\.\)(?:\s*,\s*\(\?\.\.\.\))+")
+SPACE_RE = re.compile(r"\s+")
+
+# a statement run this many times by a single test is likely in a loop
+N_PLUS_ONE = 10
+TOP = 10
+OUTSIDE = "(outside tests)"
+
+
+def normalize(query):
+    """`query` without its literal values, e.g. `... WHERE id IN (?...)`."""
+    query = STRING_RE.sub("?", query)
+    query = NUMBER_RE.sub("?", query)
+    query = LIST_RE.sub("(?...)", query)
+    query = VALUES_RE.sub("(?...)", query)
+    return SPACE_RE.sub(" ", query).strip()
+
+
+class Stat:
+    def __init__(self):
+        self.count = 0
+        self.ms = 0.0
+
+    def add(self, ms):
+        self.count += 1
+        self.ms += ms
+
+
+class Collector:
+    """Log of an odoo-bin run logging its queries, see `odoo_args`.
+
+    The output is written to `log` and parsed as it comes: the queries are
+    grouped by normalized statement, in total and per test method. Except
+    for the queries, it is echoed to the terminal. stdout and stderr are
+    written by one thread each, see `stream.communicate`, their incomplete
+    lines are kept apart.
+    """
+
+    def __init__(self, log):
+        self.log = log
+        self.path = log.path
+        self.lock = threading.Lock()
+        self.partials = {}
+        self.test = OUTSIDE
+        self.query = None
+        self.statements = {}
+        self.tests = {}
+
+    def write(self, data):
+        self.log.write(data)
+        with self.lock:
+            thread = threading.get_ident()
+            lines = (self.partials.get(thread, b"") + data).split(b"\n")
+            self.partials[thread] = lines.pop()
+            for line in lines:
+                self.feed(line.decode("utf-8", "replace"))
+
+    def feed(self, line):
+        match = LOG_RE.match(line)
+        if not match:
+            if self.query is not None:
+                # the rest of a multi-line query
+                self.query[1].append(line)
+            else:
+                click.echo(line)
+            return
+        self.flush()
+        logger, message = match.groups()
+        if logger == "odoo.sql_db":
+            match = QUERY_RE.match(message)
+            if match:
+                self.query = (float(match.group(1) or 0), [match.group(2)])
+                return
+        match = TEST_RE.match(message)
+        if match and logger.startswith("odoo.addons."):
+            self.test = f"{logger.split('.')[2]}: {match.group(1)}"
+        click.echo(line)
+
+    def flush(self):
+        if self.query is None:
+            return
+        ms, lines = self.query
+        self.query = None
+        statement = normalize(" ".join(lines))
+        self.statements.setdefault(statement, Stat()).add(ms)
+        self.tests.setdefault(self.test, {}).setdefault(statement, Stat()).add(ms)
+
+    def close(self):
+        with self.lock:
+            for partial in self.partials.values():
+                if partial:
+                    self.feed(partial.decode("utf-8", "replace"))
+            self.partials = {}
+            self.flush()
+        self.log.close()
+
+    def n_plus_ones(self):
+        """(test, statement, Stat) of the SELECTs a test ran N_PLUS_ONE times."""
+        return sorted(
+            (
+                (test, statement, stat)
+                for test, statements in self.tests.items()
+                for statement, stat in statements.items()
+                if stat.count >= N_PLUS_ONE and statement.upper().startswith("SELECT")
+            ),
+            key=lambda item: -item[2].count,
+        )
+
+    def save(self, path):
+        def stats(statements):
+            return [
+                {"statement": statement, "count": stat.count, "ms": round(stat.ms, 3)}
+                for statement, stat in sorted(statements.items())
+            ]
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        result = {
+            "statements": stats(self.statements),
+            "tests": {test: stats(self.tests[test]) for test in sorted(self.tests)},
+            "n_plus_one": [
+                {"test": test, "statement": statement, "count": stat.count}
+                for test, statement, stat in self.n_plus_ones()
+            ],
+        }
+        path.write_text(json.dumps(result, indent=1) + "\n")
+
+    def echo(self):
+        count = sum(stat.count for stat in self.statements.values())
+        ms = sum(stat.ms for stat in self.statements.values())
+        tests = len(set(self.tests) - {OUTSIDE})
+        click.echo(
+            f"\n{count} queries, {len(self.statements)} statements, {ms:.0f}ms, "
+            f"{tests} tests"
+        )
+        for title, key in [("count", "count"), ("total time", "ms")]:
+            click.echo(f"\ntop statements by {title}:")
+            ranked = sorted(
+                self.statements.items(), key=lambda item: -getattr(item[1], key)
+            )
+            for statement, stat in ranked[:TOP]:
+                click.echo(f"{stat.count:>8}{stat.ms:>10.1f}ms  {shorten(statement)}")
+        n_plus_ones = self.n_plus_ones()
+        if n_plus_ones:
+            click.echo("\nlikely N+1 (same SELECT run repeatedly by a test):")
+            for test, statement, stat in n_plus_ones[:TOP]:
+                click.echo(f"{stat.count:>8}x  {test}\n          {shorten(statement)}")
+
+
+def shorten(statement, width=120):
+    return statement if len(statement) <= width else statement[: width - 3] + "..."
+
+
+def odoo_args():
+    return ["--log-handler", "odoo.sql_db:DEBUG"]
@@ -0,0 +1,159 @@
+import os
+import sys
+import gzip
+import shutil
+import threading
+from collections import deque
+
+CHUNK_SIZE = 64 * 1024
+TAIL_LINES = 50
+
+
+class RotatingLog:
+    """Log file moved to `<log>.1` once it reaches `max_bytes`.
+
+    Older rotations are shifted up to `<log>.<backups>`. With `compress`,
+    rotated logs are gzipped by a background thread so that writers, and
+    the process they read from, don't wait for it.
+    """
+
+    def __init__(self, path, max_bytes=50 * 1024 ** 2, backups=3, compress=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.compress = compress
+        self.lock = threading.Lock()
+        self.compressing = None
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(path, "ab")
+
+    def write(self, data):
+        with self.lock:
+            size = self.file.tell()
+            if size and size + len(data) > self.max_bytes:
+                self.rotate()
+            self.file.write(data)
+
+    def rotate(self):
+        self.file.close()
+        if self.compressing:
+            self.compressing.join()
+        suffix = ".gz" if self.compress else ""
+        for index in range(self.backups - 1, 0, -1):
+            rotated = f"{self.path}.{index}{suffix}"
+            if os.path.exists(rotated):
+                os.replace(rotated, f"{self.path}.{index + 1}{suffix}")
+        if self.backups and self.compress:
+            os.replace(self.path, f"{self.path}.1")
+            self.compressing = threading.Thread(
+                target=compress, args=(f"{self.path}.1",)
+            )
+            self.compressing.start()
+        elif self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        self.file = open(self.path, "wb")
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+        if self.compressing:
+            self.compressing.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def compress(path):
+    with open(path, "rb") as rfile, gzip.open(f"{path}.gz.tmp", "wb") as wfile:
+        shutil.copyfileobj(rfile, wfile, CHUNK_SIZE)
+    os.replace(f"{path}.gz.tmp", f"{path}.gz")
+    os.unlink(path)
+
+
+class Output:
+    """Everything written to it."""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        self.chunks.append(data)
+
+    def getvalue(self):
+        return b"".join(self.chunks)
+
+
+class Tail:
+    """The last `lines` lines written to it."""
+
+    def __init__(self, lines=TAIL_LINES):
+        self.lines = deque(maxlen=lines)
+        self.partial = b""
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        lines = (self.partial + data).split(b"\n")
+        self.partial = lines.pop()
+        self.lines.extend(lines)
+        if len(self.partial) > CHUNK_SIZE:
+            # a very long line isn't kept whole
+            self.lines.append(self.partial)
+            self.partial = b""
+
+    def getvalue(self):
+        lines = list(self.lines) + ([self.partial] if self.partial else [])
+        return b"".join(line + b"\n" for line in lines)
+
+
+def pump(pipe, sinks):
+    """Pass what the process writes to `pipe` to each sink, as it comes."""
+    fd = pipe.fileno()
+    while True:
+        data = os.read(fd, CHUNK_SIZE)
+        if not data:
+            break
+        for sink in sinks:
+            sink(data)
+    pipe.close()
+
+
+def echo_to(file):
+    def write(data):
+        file.buffer.write(data)
+        file.flush()
+
+    return write
+
+
+def communicate(process, echo=False, log=None, tail=False):
+    """Read the stdout and stderr pipes of `process` until it exits.
+
+    Returns the Output of stdout and stderr. With `tail`, only their last
+    lines are kept, in Tails, so that memory stays bounded for long runs
+    whose whole output goes to `log` anyway. The output is also echoed to
+    the terminal when `echo` and written to `log` (a RotatingLog) when given.
+    """
+    outputs = []
+    threads = []
+    pipes = [(process.stdout, sys.stdout), (process.stderr, sys.stderr)]
+    for pipe, terminal in pipes:
+        output = Tail() if tail else Output()
+        sinks = [output.write]
+        if echo:
+            sinks.append(echo_to(terminal))
+        if log:
+            sinks.append(log.write)
+        thread = threading.Thread(target=pump, args=(pipe, sinks), daemon=True)
+        thread.start()
+        outputs.append(output)
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    process.wait()
+    return outputs
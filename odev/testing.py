@@ -0,0 +1,210 @@
+import re
+import time
+import hashlib
+import threading
+import subprocess
+
+import click
+
+from . import addons
+from . import persist
+from . import procs
+from . import trace
+from . import stream
+
+# odoo >= 16: "0 failed, 1 error(s) of 42 tests when loading database 'db'"
+SUMMARY_RE = re.compile(r"(\d+) failed, (\d+) error\(s\) of (\d+) tests")
+# older versions log one "Ran N tests in Xs" per test module
+RAN_RE = re.compile(r"Ran (\d+) tests? in ")
+FAIL_RE = re.compile(r" (ERROR|CRITICAL) .*?: (FAIL|ERROR): ")
+
+
+def parse_specs(test_tags, modules):
+    """Split `test_tags` in included and excluded (`-tag`) specs.
+
+    A single included tag applying to several modules to install/update is
+    expanded to one `<tag>/<module>` spec per module.
+    """
+    specs = [spec for spec in (test_tags or "").split(",") if spec]
+    excluded = [spec for spec in specs if spec.startswith("-")]
+    included = [spec for spec in specs if not spec.startswith("-")]
+    if len(included) <= 1 and modules:
+        tag = included[0] if included else ""
+        if "/" not in tag:
+            included = [f"{tag}/{module}" for module in modules]
+    return included, excluded
+
+
+def split_specs(included, excluded, jobs):
+    """Spread the included specs over at most `jobs` shards.
+
+    Returns the included specs and the test tags of each shard; exclusions
+    go to every shard.
+    """
+    shards = [included[i::jobs] for i in range(jobs)]
+    return [(shard, ",".join(shard + excluded)) for shard in shards if shard]
+
+
+def spec_module(spec):
+    if "/" not in spec:
+        return None
+    return re.split(r"[:.]", spec.split("/", 1)[1])[0] or None
+
+
+def spec_fingerprints(addons_dirs, specs):
+    """Fingerprint of the module of each spec and of all its dependencies.
+
+    Specs that don't target a module known in `addons_dirs` are left out.
+    """
+    modules = addons.find_modules(addons_dirs)
+    closures = {
+        spec: addons.closure(modules, [spec_module(spec)])
+        for spec in specs
+        if spec_module(spec) in modules
+    }
+    fingerprints = addons.fingerprints(addons_dirs, set().union(*closures.values()))
+    result = {}
+    for spec, closure in closures.items():
+        digest = hashlib.sha1()
+        for module in sorted(closure):
+            digest.update(f"{module}:{fingerprints.get(module)};".encode())
+        result[spec] = digest.hexdigest()
+    return result
+
+
+def changed_specs(name, specs, fingerprints):
+    """The specs of `specs` that changed since their last green run in `name`."""
+    green = (persist.get("green") or dict()).get(name, {})
+    return [
+        spec
+        for spec in specs
+        if spec not in fingerprints or green.get(spec) != fingerprints[spec]
+    ]
+
+
+def record_green(name, specs, fingerprints):
+    with persist.transaction():
+        green = persist.get("green") or dict()
+        green.setdefault(name, {}).update(
+            {spec: fingerprints[spec] for spec in specs if spec in fingerprints}
+        )
+        persist.save("green", green)
+
+
+class ShardResult:
+    def __init__(self, label):
+        self.label = label
+        self.tests = 0
+        self.failed = 0
+        self.errors = 0
+        self.summary = None
+        self.returncode = None
+        self.elapsed = 0.0
+        self.tail = stream.Tail()
+
+    def feed(self, line):
+        match = SUMMARY_RE.search(line)
+        if match:
+            self.summary = tuple(int(group) for group in match.groups())
+            return
+        match = RAN_RE.search(line)
+        if match:
+            self.tests += int(match.group(1))
+            return
+        match = FAIL_RE.search(line)
+        if match:
+            if match.group(2) == "FAIL":
+                self.failed += 1
+            else:
+                self.errors += 1
+
+    def counts(self):
+        if self.summary:
+            failed, errors, tests = self.summary
+            return tests, failed, errors
+        return self.tests, self.failed, self.errors
+
+    @property
+    def success(self):
+        _, failed, errors = self.counts()
+        return self.returncode == 0 and not failed and not errors
+
+
+def run_shards(shards):
+    """Run the odoo-bin commands of the shards concurrently.
+
+    `shards` is a list of (label, command, instance, log) where instance is
+    what `procs.register` records and log the stream.RotatingLog of the
+    shard. Output lines are echoed as they come, prefixed with the label of
+    their shard. Returns the ShardResult of each shard.
+    """
+    echo_lock = threading.Lock()
+    started = []
+
+    def run_shard(label, command, instance, log):
+        result = ShardResult(label)
+        start = time.perf_counter()
+        with trace.span("odoo-bin", command=" ".join(command), shard=label) as record:
+            process = subprocess.Popen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                stdin=subprocess.DEVNULL,
+            )
+            started.append(process.pid)
+            procs.register(process.pid, **instance, log=str(log.path))
+            try:
+                for raw in process.stdout:
+                    log.write(raw)
+                    result.tail.write(raw)
+                    line = raw.decode("utf-8", "replace").rstrip("\n")
+                    result.feed(line)
+                    with echo_lock:
+                        click.echo(f"[{label}] {line}")
+                result.returncode = process.wait()
+            finally:
+                procs.unregister(process.pid)
+                log.close()
+            record.update(returncode=result.returncode, tests=result.counts()[0])
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    results = [None] * len(shards)
+
+    def target(index, shard):
+        results[index] = run_shard(*shard)
+
+    threads = [
+        threading.Thread(target=target, args=(index, shard), daemon=True)
+        for index, shard in enumerate(shards)
+    ]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        procs.terminate(started, timeout=5)
+        raise
+    return results
+
+
+def echo_summary(results, elapsed):
+    click.echo(f"\n{'shard':<12}{'tests':>8}{'failed':>8}{'errors':>8}{'time':>10}")
+    totals = [0, 0, 0]
+    for result in results:
+        tests, failed, errors = result.counts()
+        totals = [totals[0] + tests, totals[1] + failed, totals[2] + errors]
+        status = "" if result.success else f"  FAILED (exit {result.returncode})"
+        click.echo(
+            f"{result.label:<12}{tests:>8}{failed:>8}{errors:>8}"
+            f"{result.elapsed:>9.1f}s{status}"
+        )
+    click.echo(
+        f"{'total':<12}{totals[0]:>8}{totals[1]:>8}{totals[2]:>8}{elapsed:>9.1f}s"
+    )
+    for result in results:
+        if not result.success:
+            click.echo(f"\nlast lines of {result.label}:")
+            click.echo(result.tail.getvalue().decode("utf-8", "replace"), nl=False)
+    return all(result.success for result in results)
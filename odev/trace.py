@@ -0,0 +1,137 @@
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+
+from pathlib import Path
+
+HOME = Path("~").expanduser()
+TRACES = HOME / ".local" / "share" / "odev" / "traces"
+MAX_TRACES = 1000
+
+# ODEV_TRACE=off disables the records, ODEV_TRACE=chrome also dumps the
+# invocation in the Chrome trace event format (chrome://tracing, Perfetto)
+MODE = os.environ.get("ODEV_TRACE", "jsonl")
+
+_lock = threading.Lock()
+_records = []
+_started = time.time()
+_command = None
+
+
+def start(command):
+    """Start recording the spans of this odev invocation running `command`."""
+    global _command, _started
+    if MODE == "off" or _command is not None:
+        return
+    _command = command
+    _started = time.time()
+    atexit.register(dump)
+
+
+@contextmanager
+def span(step, **args):
+    """Record the wall time of the block as `step`; `args` can be updated in it."""
+    start_time = time.time()
+    start = time.perf_counter()
+    try:
+        yield args
+    finally:
+        if _command is not None:
+            record = {
+                "step": step,
+                "start": start_time,
+                "elapsed": time.perf_counter() - start,
+                "tid": threading.get_ident(),
+                **args,
+            }
+            with _lock:
+                _records.append(record)
+
+
+def step_name(command):
+    """Name under which a subprocess is aggregated, e.g. `git checkout`."""
+    program = os.path.basename(command[0])
+    if program.startswith("python") and len(command) > 1:
+        # python odoo-bin ..., python -m debugpy ... odoo-bin
+        for arg in command[1:]:
+            if os.path.basename(arg) == "odoo-bin":
+                return "odoo-bin"
+    if program == "git" and len(command) > 1:
+        return f"git {command[1]}"
+    return program
+
+
+def dump():
+    # invocations that ran nothing, like `odev current`, aren't worth a file
+    if not _records:
+        return
+    TRACES.mkdir(parents=True, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(_started))}-{os.getpid()}"
+    elapsed = time.time() - _started
+    header = {
+        "command": _command,
+        "argv": sys.argv[1:],
+        "start": _started,
+        "elapsed": elapsed,
+        "pid": os.getpid(),
+    }
+    with open(TRACES / f"{name}.jsonl", "w") as file:
+        for record in [header, *_records]:
+            file.write(json.dumps(record) + "\n")
+    if MODE == "chrome":
+        dump_chrome(TRACES / f"{name}.trace.json", header)
+    prune()
+
+
+def dump_chrome(path, header):
+    pid = header["pid"]
+    events = [
+        {
+            "name": f"odev {header['command']}",
+            "ph": "X",
+            "ts": header["start"] * 1e6,
+            "dur": header["elapsed"] * 1e6,
+            "pid": pid,
+            "tid": threading.main_thread().ident,
+            "args": {"argv": header["argv"]},
+        }
+    ]
+    for record in _records:
+        args = {
+            key: value
+            for key, value in record.items()
+            if key not in ("step", "start", "elapsed", "tid")
+        }
+        events.append(
+            {
+                "name": record["step"],
+                "ph": "X",
+                "ts": record["start"] * 1e6,
+                "dur": record["elapsed"] * 1e6,
+                "pid": pid,
+                "tid": record["tid"],
+                "args": args,
+            }
+        )
+    with open(path, "w") as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+def prune():
+    traces = sorted(TRACES.glob("*.jsonl"))
+    for trace in traces[:-MAX_TRACES]:
+        trace.unlink()
+        trace.with_suffix(".trace.json").unlink(missing_ok=True)
+
+
+def load():
+    """Header and records of every recorded invocation, oldest first."""
+    for path in sorted(TRACES.glob("*.jsonl")):
+        with open(path) as file:
+            lines = [json.loads(line) for line in file if line.strip()]
+        if lines:
+            yield lines[0], lines[1:]
@@ -0,0 +1,127 @@
+import click
+
+from . import db
+from . import addons
+from . import persist
+
+
+def get_states():
+    # dbname -> {module: fingerprint of the code it was installed/updated with}
+    return persist.get("updated") or dict()
+
+
+def snapshot(
+    obj, name, dbname, modules, no_enterprise=False, base_branch=None, auto=False
+):
+    """State of the code and of `dbname` right before odoo is started on it.
+
+    Only the modules `record` may store are fingerprinted: the dependents
+    of `modules` (as given to -i/-u) and the ones they would install, and
+    with `auto` all the installed modules, which `to_update` compares.
+    """
+    addons_dirs = obj.get_addons(name, no_enterprise, base_branch).split(",")
+    index = obj.get_index(addons_dirs)
+    installed = db.admin().installed_modules(dbname)
+    modules = [module for module in (modules or "").split(",") if module]
+    if auto or "all" in modules:
+        names = set(installed)
+    else:
+        names = addons.dependents(index, modules, installed)
+    names |= addons.required(index, modules) - set(installed)
+    return dict(
+        dbname=dbname,
+        index=index,
+        fingerprints=addons.fingerprints(addons_dirs, names),
+        installed=installed,
+    )
+
+
+def to_update(snapshot):
+    """Modules to pass to `-u` so that the database runs the current code.
+
+    These are the installed modules whose fingerprint changed since they
+    were installed or updated, minus those depending on another changed
+    module: odoo updates the installed dependents of a module itself.
+    Returns None when nothing was recorded for the database.
+    """
+    state = get_states().get(snapshot["dbname"])
+    if state is None:
+        return None
+    fingerprints = snapshot["fingerprints"]
+    installed = snapshot["installed"]
+    changed = {
+        module
+        for module in installed
+        if module in fingerprints and state.get(module) != fingerprints[module]
+    }
+    index = snapshot["index"]
+    return sorted(
+        module
+        for module in changed
+        if module not in addons.dependents(index, changed - {module}, installed)
+    )
+
+
+def record(snapshot, modules):
+    """Record the code the database was just updated with, see `to_update`.
+
+    `modules` are the comma separated modules given to -i/-u. They, their
+    installed dependents and the newly installed modules were updated with
+    the code of the `snapshot`, unless odoo failed to, which leaves them in
+    the `to install`/`to upgrade` state.
+    """
+    modules = [module for module in (modules or "").split(",") if module]
+    if not modules:
+        return
+    dbname = snapshot["dbname"]
+    installed = db.admin().installed_modules(dbname, states=("installed",))
+    if "all" in modules:
+        updated = set(installed)
+    else:
+        updated = addons.dependents(snapshot["index"], modules, installed) | (
+            set(installed) - set(snapshot["installed"])
+        )
+    fingerprints = snapshot["fingerprints"]
+    with persist.transaction():
+        states = get_states()
+        states.setdefault(dbname, {}).update(
+            {
+                module: fingerprints[module]
+                for module in updated
+                if module in installed and module in fingerprints
+            }
+        )
+        persist.save("updated", states)
+
+
+def copy(olddbname, newdbname):
+    if olddbname not in get_states() and newdbname not in get_states():
+        return
+    with persist.transaction():
+        states = get_states()
+        if olddbname in states:
+            states[newdbname] = dict(states[olddbname])
+        else:
+            states.pop(newdbname)
+        persist.save("updated", states)
+
+
+def forget(dbname):
+    if dbname not in get_states():
+        return
+    with persist.transaction():
+        states = get_states()
+        states.pop(dbname, None)
+        persist.save("updated", states)
+
+
+def echo(modules):
+    if modules is None:
+        click.echo(
+            "Nothing recorded for this database yet, update it once with "
+            "`-u all` (or rebuild its basedb) to track its modules."
+        )
+    elif modules:
+        click.echo(f"auto update: {','.join(modules)}")
+    else:
+        click.echo("auto update: no module changed")
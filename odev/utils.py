@@ -1,165 +1,128 @@
-import os
-import re
 import click
 import subprocess
-from configparser import ConfigParser
-
-from pathlib import Path
-
-from . import persist
-
-HOME = Path("~").expanduser()
-
-
-class OdevContextObject:
-    def __init__(self):
-        config = ConfigParser(allow_no_value=True)
-        config.read(HOME / ".odev")
-        self.src = Path(config["DEFAULT"].get("src")).expanduser()
-        custom_addons_dir = config["DEFAULT"].get("custom-addons")
-        if custom_addons_dir:
-            self.custom_addons_dir = Path(custom_addons_dir).expanduser()
-        else:
-            self.custom_addons_dir = None
-        self.worktrees = Path(config["DEFAULT"].get("worktrees")).expanduser()
-        self.workspaces = Path(config["DEFAULT"].get("workspaces")).expanduser()
-        self.filestore = Path(config["DEFAULT"].get("filestore")).expanduser()
-        self.port = config["DEFAULT"].get("port")
-
-    def set_current(self, name):
-        persist.save("current", name)
-
-    def remove_current(self):
-        current = self.get_current()
-        persist.remove("current")
-        persist.remove_from_list("all", current)
-
-    def get_current(self):
-        return persist.get("current")
-
-    def get_dirs(self, repo, branch):
-        return (self.src / repo, self.worktrees / branch / repo)
-
-    # TODO perhaps we only allow current for the moment
-    def identify_name(self):
-        return self.get_current()
-
-    def get_addons(self, name, no_enterprise=False, base_branch=None):
-        default_base_branch, _ = get_base_branch(name)
-        base_branch = base_branch if base_branch else default_base_branch
-        enterprise_worktree = self.worktrees / base_branch / "enterprise"
-        odoo_worktree = self.worktrees / base_branch / "odoo"
-        enterprise = [] if no_enterprise else [str(enterprise_worktree)]
-        return ",".join(
-            [
-                *enterprise,
-                str(odoo_worktree / "addons"),
-                str(odoo_worktree / "odoo" / "addons"),
-            ]
-        ) + ('' if not self.custom_addons_dir else f",{self.custom_addons_dir}")
-
-    def get_python(self):
-        _, out, _ = run(["which", "python"])
-        return out.decode("utf-8").strip()
-
-    def get_odoo_bin(self, name, base_branch=None):
-        default_base_branch, _ = get_base_branch(name)
-        base_branch = base_branch if base_branch else default_base_branch
-        return str(self.worktrees / base_branch / "odoo" / "odoo-bin")
-
-    def init_db(self, name, dbname, modules=None, no_demo=None):
-        python = self.get_python()
-        odoobin = self.get_odoo_bin(name)
-        command = (
-            [python, odoobin]
-            + ["--addons-path", self.get_addons(name)]
-            + ["-d", dbname]
-            + (["-i", modules] if modules else [])
-            + (["--without-demo", "ALL"] if no_demo else [])
-            + (["--stop-after-init"])
-        )
-        return command
-
-    def list_branches(self, search_string=False):
-        return [
-            branch_name
-            for branch_name in persist.get("all")
-            if (search_string or "") in branch_name
-        ]
-
-    def dropdb(self, dbname):
-        return ["dropdb", dbname]
-
-    def copydb(self, olddbname, newdbname):
-        return ["createdb", "-O", os.environ.get("USER"), "-T", olddbname, newdbname]
 
-    def drop_filestore(self, name):
-        return ["rm", "-rf", str(self.filestore / name)]
-
-    def copy_filestore(self, olddbname, newdbname):
-        return [
-            "cp",
-            "-r",
-            str(self.filestore / olddbname),
-            str(self.filestore / newdbname),
-        ]
-
-    def get_workspace_dir(self, base_branch):
-        return str(self.workspaces / f"{base_branch}.code-workspace")
 
+def run(
+    command,
+    verbose=False,
+    cwd=None,
+    quiet=False,
+    instance=None,
+    log=None,
+    tail=False,
+):
+    """Run `command`, streaming its output to the terminal when `verbose`.
+
+    `instance` (name, dbname, port) registers the process as an odoo
+    instance of a dev env while it runs, see `procs.register`. The output is
+    also written to `log` (a stream.RotatingLog) when given, in which case
+    `tail` returns only the last lines of stdout and stderr instead of all
+    of it, see `stream.communicate`. Each run is recorded with its wall
+    time, exit code and output sizes, see `trace`.
+    """
+    from . import procs
+    from . import trace
+    from . import stream
 
-def run(command, verbose=False):
     str_command = f"{' '.join(command)}"
-    if verbose:
+    with trace.span(trace.step_name(command), command=str_command) as record:
+        if verbose and not log:
+            # straight to the terminal, which keeps colors and prompts
+            process = None
+            try:
+                click.echo(str_command)
+                process = subprocess.Popen(command, cwd=cwd)
+                if instance:
+                    procs.register(process.pid, **instance)
+                out, err = process.communicate()
+                record["returncode"] = process.returncode
+                return process.returncode == 0, out, err
+            except KeyboardInterrupt:
+                process.kill()
+                record["returncode"] = "interrupted"
+                return exit(1)
+            finally:
+                if instance and process:
+                    procs.unregister(process.pid)
+
+        if verbose:
+            click.echo(f"{str_command} (log: {log.path})")
+        if log:
+            log.write(f"\n$ {str_command}\n".encode())
+        process = subprocess.Popen(
+            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd
+        )
+        if instance:
+            extra = dict(log=str(log.path)) if log else {}
+            procs.register(process.pid, **instance, **extra)
         try:
-            click.echo(str_command)
-            process = subprocess.Popen(command)
-            out, err = process.communicate()
-            return process.returncode == 0, out, err
+            out, err = stream.communicate(
+                process, echo=verbose, log=log, tail=bool(log and tail)
+            )
         except KeyboardInterrupt:
             process.kill()
+            record["returncode"] = "interrupted"
             return exit(1)
-
-    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    out, err = process.communicate()
-    click.echo(f"{str_command} : {process.returncode}")
-    return process.returncode == 0, out, err
+        finally:
+            if instance:
+                procs.unregister(process.pid)
+        record.update(
+            returncode=process.returncode, stdout_bytes=out.size, stderr_bytes=err.size
+        )
+        if not quiet and not verbose:
+            click.echo(f"{str_command} : {process.returncode}")
+        return process.returncode == 0, out.getvalue(), err.getvalue()
 
 
-def return_to_cwd(func):
-    def wrapped(*args, **kwargs):
-        current_dir = os.getcwd()
-        result = func(*args, **kwargs)
-        new_current_dir = os.getcwd()
-        if current_dir != new_current_dir:
-            os.chdir(current_dir)
-        return result
+def run_in_repos(pipelines):
+    """Run the commands of each repo in order, all the repos concurrently.
 
-    return wrapped
+    `pipelines` maps a repo directory to its list of commands. A repo's
+    pipeline stops at its first failing command. The output is printed per
+    repo once everything is done, followed by a summary of the failures.
+    Returns True when every pipeline succeeded.
+    """
+    import textwrap
+    from concurrent.futures import ThreadPoolExecutor
+
+    def run_pipeline(item):
+        repo_dir, commands = item
+        lines = []
+        for command in commands:
+            success, _, err = run(command, cwd=repo_dir, quiet=True)
+            lines.append(f"{' '.join(command)} : {'ok' if success else 'failed'}")
+            if not success:
+                return lines, (command, err.decode("utf-8").strip())
+        return lines, None
+
+    with ThreadPoolExecutor(max_workers=len(pipelines) or 1) as executor:
+        results = list(executor.map(run_pipeline, pipelines.items()))
+
+    failures = []
+    for repo_dir, (lines, failure) in zip(pipelines, results):
+        click.echo(f"{repo_dir}")
+        for line in lines:
+            click.echo(f"    {line}")
+        if failure:
+            failures.append((repo_dir, *failure))
+
+    for repo_dir, command, err in failures:
+        click.echo(f"Failed in {repo_dir}: {' '.join(command)}", err=True)
+        if err:
+            click.echo(textwrap.indent(err, "    "), err=True)
+    return not failures
 
 
 def get_dbs(subname):
-    command = f"psql -l|awk '{{print $1}}'|grep -w {subname}"
-    ps = subprocess.Popen(
-        command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
-    )
-    return ps.communicate()[0].decode("utf-8").strip().split("\n")
+    from . import db
+
+    return db.admin().list(subname)
 
 
 def db_exists(name):
-    return name in get_dbs(name)
-
-
-def odoo_bin_proc_ids(name=False):
-    if not name:
-        command = f"ps aux|grep odoo-bin|grep python|awk '{{print $2}}'"
-    else:
-        regex = f"{name}.*odoo-bin"
-        command = f"ps aux|grep {regex}|grep python|awk '{{print $2}}'"
-    ps = subprocess.Popen(
-        command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
-    )
-    return ps.communicate()[0].decode("utf-8").strip().split("\n")[:-1]
+    from . import db
+
+    return db.admin().exists(name)
 
 
 def identify_current(func):
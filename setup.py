@@ -8,6 +8,9 @@ setup(
     install_requires=[
         'click',
     ],
+    extras_require={
+        'postgres': ['psycopg2'],
+    },
     entry_points='''
         [console_scripts]
         odev=odev.main:main
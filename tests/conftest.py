@@ -0,0 +1,94 @@
+"""A dev env whose odoo-bin and PostgreSQL tools are stubs, see `stub_home`."""
+import os
+import sys
+import json
+import subprocess
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+NAME = "master-stub"
+
+# the databases are the lines of $HOME/dbs
+DBS_STUB = """#!/bin/sh
+dbs="$HOME/dbs"
+for arg; do name=$arg; done
+"""
+STUBS = {
+    "createdb": DBS_STUB + 'echo "$name" >> "$dbs"\n',
+    "dropdb": DBS_STUB
+    + 'grep -qx "$name" "$dbs" || exit 1\n'
+    + 'grep -vx "$name" "$dbs" > "$dbs.new"; mv "$dbs.new" "$dbs"\n',
+    "psql": DBS_STUB
+    + """case "$name" in
+  *"SELECT 1 FROM pg_database"*)
+    db=$(echo "$name" | sed "s/.*datname = '\\([^']*\\)'.*/\\1/")
+    grep -qx "$db" "$dbs" && echo 1;;
+  *"SELECT datname"*) cat "$dbs";;
+esac
+case "$*" in
+  *ON_ERROR_STOP*) cat > /dev/null;;
+esac
+exit 0
+""",
+}
+# records its arguments, one run per line, and passes its tests
+ODOO_BIN = """import os, sys, json
+with open(os.path.join(os.environ["HOME"], "odoo-bin.log"), "a") as log:
+    log.write(json.dumps(sys.argv[1:]) + "\\n")
+print("0 failed, 0 error(s) of 1 tests")
+"""
+
+
+@pytest.fixture
+def stub_home(tmp_path):
+    """HOME of the dev env NAME: its basedb exists, its addons are a and b."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    for program, script in STUBS.items():
+        (bin_dir / program).write_text(script)
+        (bin_dir / program).chmod(0o755)
+    odoo = tmp_path / "worktrees" / "master" / "odoo"
+    for module in ["a", "b"]:
+        (odoo / "addons" / module).mkdir(parents=True)
+        (odoo / "addons" / module / "__manifest__.py").write_text("{}")
+    (odoo / "odoo" / "addons" / "base").mkdir(parents=True)
+    (odoo / "odoo" / "addons" / "base" / "__manifest__.py").write_text("{}")
+    (odoo / "odoo-bin").write_text(ODOO_BIN)
+    (tmp_path / ".odev").write_text(
+        "[DEFAULT]\n"
+        f"src = {tmp_path / 'src'}\n"
+        f"worktrees = {tmp_path / 'worktrees'}\n"
+        f"workspaces = {tmp_path / 'workspaces'}\n"
+        f"filestore = {tmp_path / 'filestore'}\n"
+        "port = 8069\n"
+        f"python = {sys.executable}\n"
+    )
+    (tmp_path / ".odev.json").write_text(json.dumps({"all": [NAME]}))
+    (tmp_path / "dbs").write_text(f"{NAME}-basedb\n")
+    return tmp_path
+
+
+@pytest.fixture
+def stub_odev(stub_home):
+    """Run odev in `stub_home`, returns the CompletedProcess."""
+    return lambda *args: odev(stub_home, *args)
+
+
+def odev(home, *args):
+    return subprocess.run(
+        [sys.executable, "-m", "odev", *args],
+        cwd=home,
+        env=dict(
+            os.environ,
+            HOME=str(home),
+            PATH=f"{home / 'bin'}{os.pathsep}{os.environ['PATH']}",
+            PYTHONPATH=str(ROOT),
+            ODEV_TRACE="off",
+            # never reach a real server, even with psycopg2 installed
+            PGHOST=str(home / "no-server"),
+        ),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
@@ -0,0 +1,26 @@
+"""`odev drop` in the stub dev env, see conftest.py."""
+from conftest import NAME
+
+
+def add_db(home, dbname):
+    with open(home / "dbs", "a") as wfile:
+        wfile.write(f"{dbname}\n")
+    (home / "filestore" / dbname / "ab").mkdir(parents=True)
+    (home / "filestore" / dbname / "ab" / "blob").write_text("data")
+
+
+def test_drop(stub_home, stub_odev):
+    add_db(stub_home, f"{NAME}-old")
+    process = stub_odev("drop", NAME, "-s", "old")
+    assert process.returncode == 0, process.stdout.decode()
+    assert f"{NAME}-old" not in (stub_home / "dbs").read_text().split()
+    assert not (stub_home / "filestore" / f"{NAME}-old").exists()
+
+
+def test_drop_failed(stub_home, stub_odev):
+    add_db(stub_home, f"{NAME}-busy")
+    # like a database in use
+    (stub_home / "bin" / "dropdb").write_text("#!/bin/sh\nexit 1\n")
+    stub_odev("drop", NAME, "-s", "busy")
+    blob = stub_home / "filestore" / f"{NAME}-busy" / "ab" / "blob"
+    assert blob.read_text() == "data"
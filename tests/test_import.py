@@ -0,0 +1,51 @@
+"""`odev import` in the stub dev env, see conftest.py."""
+import zipfile
+
+import pytest
+
+from conftest import NAME
+
+
+def make_zip(path, members):
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return path
+
+
+def test_import(stub_home, stub_odev):
+    backup = make_zip(
+        stub_home / "backup.zip",
+        {"dump.sql": "SELECT 1;\n", "filestore/ab/blob": "data"},
+    )
+    process = stub_odev("import", NAME, "-z", str(backup), "-s", "imported")
+    assert process.returncode == 0, process.stdout.decode()
+    assert f"{NAME}-imported" in (stub_home / "dbs").read_text().split()
+    blob = stub_home / "filestore" / f"{NAME}-imported" / "ab" / "blob"
+    assert blob.read_text() == "data"
+
+
+def test_import_sql_error(stub_home, stub_odev):
+    # psql stops reading at the first error
+    (stub_home / "bin" / "psql").write_text("#!/bin/sh\nexit 3\n")
+    backup = make_zip(stub_home / "backup.zip", {"dump.sql": "SELECT 1;\n"})
+    process = stub_odev("import", NAME, "-z", str(backup), "-s", "broken")
+    assert process.returncode == 1
+    assert b"dump.sql could not be restored" in process.stdout
+    assert b"Traceback" not in process.stdout
+
+
+@pytest.mark.parametrize(
+    "member", ["filestore/../../evil", "filestore//tmp/evil", "dump/../../evil"]
+)
+def test_import_outside(stub_home, stub_odev, member):
+    members = {member: "PGDMP"}
+    if member.startswith("filestore/"):
+        members["dump.sql"] = "SELECT 1;\n"
+    backup = make_zip(stub_home / "evil.zip", members)
+    process = stub_odev("import", NAME, "-z", str(backup), "-s", "evil")
+    assert process.returncode == 1
+    assert b"Refusing to extract" in process.stdout
+    # refused before the database is created
+    assert f"{NAME}-evil" not in (stub_home / "dbs").read_text().split()
+    assert not (stub_home / "evil").exists()
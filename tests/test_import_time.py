@@ -0,0 +1,67 @@
+"""Import-time budget of the commands called from shell prompts and editors."""
+import os
+import re
+import sys
+import json
+import subprocess
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+IMPORT_RE = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)")
+# own imports of odev, click excluded
+BUDGET_MS = 25
+RUNS = 3
+# only needed by the commands working on databases, git or odoo-bin
+HEAVY = [
+    "odev.utils",
+    "odev.db",
+    "odev.addons",
+    "odev.filestore",
+    "odev.stream",
+    "odev.procs",
+    "concurrent.futures",
+    "configparser",
+    "psycopg2",
+]
+
+
+def import_times(home, *args):
+    """Cumulative import time of each module imported by `odev *args`, in ms."""
+    env = dict(os.environ, HOME=str(home), PYTHONPATH=str(ROOT), ODEV_TRACE="off")
+    # measure the imports, not the compilation
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "odev", *args],
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True,
+    )
+    times = {}
+    for line in process.stderr.decode().splitlines():
+        match = IMPORT_RE.match(line)
+        if match:
+            times[match.group(2)] = int(match.group(1)) / 1000
+    return times
+
+
+@pytest.fixture
+def home(tmp_path):
+    (tmp_path / ".odev.json").write_text(
+        json.dumps({"all": [f"master-{index}" for index in range(300)]})
+    )
+    return tmp_path
+
+
+@pytest.mark.parametrize("command", ["current", "list"])
+def test_import_budget(home, command):
+    import_times(home, command)
+    runs = []
+    for _ in range(RUNS):
+        times = import_times(home, command)
+        for module in HEAVY:
+            assert module not in times, f"odev {command} imports {module}"
+        runs.append(times["odev.main"] - times.get("click", 0))
+    assert min(runs) < BUDGET_MS, f"odev {command} imports took {min(runs):.1f}ms"
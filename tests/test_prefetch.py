@@ -0,0 +1,139 @@
+"""`prepare --pull` right after `odev prefetch` doesn't need the remote."""
+import os
+import sys
+import json
+import subprocess
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+BASE = "17.0"
+REPOS = {"odoo": BASE, "enterprise": BASE, "upgrade": "master"}
+
+
+def git(*args, cwd=None):
+    process = subprocess.run(
+        ["git", *args], cwd=cwd, stdout=subprocess.PIPE, check=True
+    )
+    return process.stdout.decode().strip()
+
+
+def commit(repo, message):
+    (repo / "file").write_text(message)
+    git("add", "file", cwd=repo)
+    git("commit", "-qm", message, cwd=repo)
+    return git("rev-parse", "HEAD", cwd=repo)
+
+
+def odev(home, *args):
+    process = subprocess.run(
+        [sys.executable, "-m", "odev", *args],
+        cwd=home,
+        env=dict(os.environ, HOME=str(home), PYTHONPATH=str(ROOT), ODEV_TRACE="off"),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
+    output = process.stdout.decode()
+    assert process.returncode == 0, output
+    return output
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    for role in ["AUTHOR", "COMMITTER"]:
+        monkeypatch.setenv(f"GIT_{role}_NAME", "odev")
+        monkeypatch.setenv(f"GIT_{role}_EMAIL", "odev@localhost")
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+    monkeypatch.setenv("HOME", str(tmp_path))
+    (tmp_path / ".odev").write_text(
+        "[DEFAULT]\n"
+        f"src = {tmp_path / 'src'}\n"
+        f"worktrees = {tmp_path / 'worktrees'}\n"
+        f"workspaces = {tmp_path / 'workspaces'}\n"
+        f"filestore = {tmp_path / 'filestore'}\n"
+        "port = 8069\n"
+    )
+    (tmp_path / ".odev.json").write_text(json.dumps({"all": [f"{BASE}-base"]}))
+    return tmp_path
+
+
+def make_repo(home, repo, branch):
+    """Bare origin of `repo`, its clone in src and the worktree of `branch`."""
+    origin = home / "origin" / f"{repo}.git"
+    git("init", "-q", "--bare", "-b", branch, str(origin))
+    work = home / "work" / repo
+    git("clone", "-q", str(origin), str(work))
+    git("checkout", "-q", "-b", branch, cwd=work)
+    commit(work, "initial")
+    git("push", "-q", "origin", branch, cwd=work)
+
+    src = home / "src" / repo
+    git("clone", "-q", str(origin), str(src))
+    if repo != "upgrade":
+        git("checkout", "-q", "--detach", cwd=src)
+        worktree = home / "worktrees" / BASE / repo
+        git("worktree", "add", "-q", str(worktree), branch, cwd=src)
+    return work
+
+
+@pytest.fixture
+def pushed(home):
+    """Commit of each repo pushed to origin after it was cloned in src."""
+    works = {repo: make_repo(home, repo, branch) for repo, branch in REPOS.items()}
+    pushed = {}
+    for repo, work in works.items():
+        pushed[repo] = commit(work, "pushed after the clone")
+        git("push", "-q", "origin", REPOS[repo], cwd=work)
+    return pushed
+
+
+def prepared(home, repo):
+    """HEAD and current branch of `repo` where prepare checks it out."""
+    directory = home / ("src" if repo == "upgrade" else f"worktrees/{BASE}") / repo
+    return (
+        git("rev-parse", "HEAD", cwd=directory),
+        git("branch", "--show-current", cwd=directory),
+    )
+
+
+def test_prepare_after_prefetch(home, pushed):
+    output = odev(home, "prefetch")
+    assert output.count("1 fetched") == 3, output
+
+    # any fetch or pull would now fail
+    (home / "origin").rename(home / "gone")
+    output = odev(home, "prepare", f"{BASE}-feature", "--pull")
+    assert "failed" not in output.lower(), output
+    assert "git pull" not in output and "git fetch" not in output, output
+    assert output.count("git merge --ff-only") == 3, output
+    for repo in REPOS:
+        assert prepared(home, repo) == (pushed[repo], f"{BASE}-feature")
+
+
+def test_prefetch_missing_branch(home, pushed):
+    # no 16.0 on the origins of odoo and enterprise
+    state = json.loads((home / ".odev.json").read_text())
+    state["all"].append("16.0-old")
+    (home / ".odev.json").write_text(json.dumps(state))
+
+    output = odev(home, "prefetch")
+    assert "fetch failed" not in output, output
+    assert output.count("1 fetched, 0 up to date") == 3, output
+    prefetched = json.loads((home / ".odev.json").read_text())["prefetched"]
+    assert set(prefetched[str(home / "src" / "odoo")]) == {BASE}
+
+
+def test_prepare_after_stale_prefetch(home, pushed):
+    odev(home, "prefetch")
+    state = json.loads((home / ".odev.json").read_text())
+    for branches in state["prefetched"].values():
+        for record in branches.values():
+            record["time"] -= 2 * 60 * 60
+    (home / ".odev.json").write_text(json.dumps(state))
+
+    output = odev(home, "prepare", f"{BASE}-feature", "--pull")
+    assert "git merge --ff-only" not in output, output
+    assert output.count("git pull origin") == 3, output
+    for repo in REPOS:
+        assert prepared(home, repo) == (pushed[repo], f"{BASE}-feature")
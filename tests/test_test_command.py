@@ -0,0 +1,34 @@
+"""`odev test` in the stub dev env, see conftest.py."""
+import json
+
+from conftest import NAME
+
+
+def odoo_runs(home):
+    with open(home / "odoo-bin.log") as rfile:
+        return [json.loads(line) for line in rfile]
+
+
+def test_shard_modules(stub_home, stub_odev):
+    process = stub_odev("test", NAME, "-j", "2", "-i", "a,b")
+    assert process.returncode == 0, process.stdout.decode()
+    install, *shards = odoo_runs(stub_home)
+    assert install[install.index("-i") + 1] == "a,b"
+    tags = sorted(shard[shard.index("--test-tags") + 1] for shard in shards)
+    assert tags == ["/a", "/b"]
+    assert all("-i" not in shard for shard in shards)
+
+
+def test_changed_only_needs_modules(stub_home, stub_odev):
+    process = stub_odev("test", NAME, "--changed-only")
+    assert process.returncode == 2
+    assert b"--changed-only needs the modules" in process.stdout
+    assert not (stub_home / "odoo-bin.log").exists()
+
+
+def test_sql_profile_echo(stub_odev):
+    process = stub_odev("test", NAME, "-t", "/a", "--sql-profile")
+    output = process.stdout.decode()
+    assert process.returncode == 0, output
+    # the `$ command` header of the log, then `command : returncode`
+    assert output.count("odoo.sql_db:DEBUG") == 2, output